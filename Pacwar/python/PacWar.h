@@ -113,6 +113,43 @@ void PrepTest(World *w1, World *w2, void (*draw)(int x, int y, Cell c));
  * *******************************************************************/
 void PrepDuel(World *w1, World *w2, void (*draw)(int x, int y, Cell c));
 
+/* *******************************************************************
+ * If nonzero (the default), FastDuel and FastDuelBits stop as soon as
+ * they see the world repeat itself and report the counts the full
+ * simulation would have reached.  Cycles of up to MaxPeriod rounds are
+ * caught within a couple of periods; longer ones may be missed.
+ * *******************************************************************/
+#define MaxPeriod 64
+extern int DetectCycles;
+
+/* *******************************************************************
+ * Engine counters.  While CollectStats is nonzero (it is zero by
+ * default), every FastDuel / FastDuelBits / TraceDuel adds its tallies
+ * to a global PacStats when it finishes; with it off the engines only
+ * test one pointer.  MergeStats is atomic, so duels may run on many
+ * threads at once.
+ *
+ *   duels            duels finished
+ *   rounds           rounds actually simulated
+ *   cells            mite cells updated, summed over those rounds
+ *   births           blobs claimed by a unique attacker
+ *   conversions      mites converted by a unique enemy attacker
+ *   blowaways        mites blown away by several top attackers
+ *   old_age_deaths   mites dying at age 3
+ *   cycle_exits      duels ended early by cycle detection
+ *   rounds_skipped   rounds those duels did not have to simulate
+ * *******************************************************************/
+typedef struct
+{
+  long long duels, rounds, cells, births, conversions, blowaways,
+      old_age_deaths, cycle_exits, rounds_skipped;
+} PacStats;
+
+extern int CollectStats;
+void MergeStats(const PacStats *s);
+void GetStats(PacStats *s);
+void ResetStats(void);
+
 /* *******************************************************************
  * Run a duel between species with genes g1 & g2 for at most *rounds.
  * When done, *rounds will be the number of rounds actually required,
@@ -122,6 +159,33 @@ void PrepDuel(World *w1, World *w2, void (*draw)(int x, int y, Cell c));
 void FastDuel(PacGenePtr g1, PacGenePtr g2, int *rounds, int *count1,
               int *count2);
 
+/* *******************************************************************
+ * Same as FastDuel, and also sets bit i of *used1 (*used2) if locus i
+ * of g1 (g2) was read at any point in the duel.  Changing a locus that
+ * was never read cannot change the outcome.
+ * *******************************************************************/
+void TraceDuel(PacGenePtr g1, PacGenePtr g2, int *rounds, int *count1,
+               int *count2, unsigned long long *used1,
+               unsigned long long *used2);
+
+/* *******************************************************************
+ * Same as FastDuel (always simulating every round, never skipping a
+ * cycle), and also records the counts after each round in counts[r]
+ * for r = 0..*rounds-1.  If snaps is not NULL, it also receives the
+ * interior of the world after each round, (MaxX-2)*(MaxY-2) bytes per
+ * round in x-major order, each cell packed as
+ * kind | dir << 2 | (age + 1) << 4 (dir 0 for blobs).
+ * *******************************************************************/
+void TrajectoryDuel(PacGenePtr g1, PacGenePtr g2, int *rounds,
+                    int (*counts)[2], unsigned char *snaps);
+
+/* *******************************************************************
+ * Same as FastDuel, but simulated on packed bit planes instead of a
+ * World of Cells (see PacWarBits.c).  Results are identical.
+ * *******************************************************************/
+void FastDuelBits(PacGenePtr g1, PacGenePtr g2, int *rounds, int *count1,
+                  int *count2);
+
 /* *******************************************************************
  * Run a test of the species with gene g1 for at most *rounds.
  * When done, *rounds will be the number of rounds actually required,
@@ -0,0 +1,417 @@
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "PacWar.h"
+
+/* *******************************************************************
+ *
+ * Bit-plane engine for PacWar duels.
+ *
+ * The 19x9 interior of the world is stored as a handful of bit planes
+ * (species 1, species 2, two direction bits and two age bits).  Each
+ * interior row takes 21 bits (x = 0..20, the two barrier columns are
+ * kept as always-zero guard bits) and three rows share a 64-bit word,
+ * so a plane is NW = 3 words.  A round of ComputeNewWorld is then a
+ * fixed sequence of word-wide shifts and boolean ops, with the gene
+ * tables turned into per-age selection masks once per duel.
+ *
+ * FastDuelBits gives exactly the same results as FastDuel.
+ *
+ * ******************************************************************/
+
+#define NW 3
+#define ROW_BITS 21
+#define WORD_MASK ((((uint64_t)1) << 63) - 1)
+#define ROW_INTERIOR ((uint64_t)0xFFFFE) /* x = 1..19 */
+
+typedef uint64_t Plane[NW];
+
+/* The state of one world, all planes restricted to the interior. */
+typedef struct bitworld
+{
+  Plane s1, s2;   /* which species occupies the cell */
+  Plane d0, d1;   /* direction bits of mites */
+  Plane a0, a1;   /* age bits of mites */
+} BitWorld;
+
+/* Per-age selection masks: sel[a] is all ones if the table entry for a
+   mite of age a has the given bit set.  Index 0 is the low bit of the
+   turn, index 1 the high bit. */
+typedef struct agesel
+{
+  uint64_t bit[2][4];
+} AgeSel;
+
+/* A gene turned into selection masks. */
+typedef struct bitgene
+{
+  AgeSel u, v[4], w, x, y[4], z[4];
+} BitGene;
+
+/* The opposite of each direction */
+static const int opdir_bits[4] = {West, South, East, North};
+
+static int popcount64(uint64_t x)
+{
+#if defined(__GNUC__) || defined(__clang__)
+  return __builtin_popcountll(x);
+#else
+  x = x - ((x >> 1) & 0x5555555555555555ULL);
+  x = (x & 0x3333333333333333ULL) + ((x >> 2) & 0x3333333333333333ULL);
+  x = (x + (x >> 4)) & 0x0F0F0F0F0F0F0F0FULL;
+  return (int)((x * 0x0101010101010101ULL) >> 56);
+#endif
+}
+
+static void SetAgeSel(AgeSel *s, const signed char *turns, int ages)
+{
+  int a, b;
+
+  memset(s, 0, sizeof(*s));
+  for (a = 0; a < ages; a++)
+    for (b = 0; b < 2; b++)
+      s->bit[b][a] = ((turns[a] >> b) & 1) ? ~(uint64_t)0 : 0;
+}
+
+static void SetBitGene(PacGenePtr g, BitGene *bg)
+{
+  int e;
+
+  SetAgeSel(&bg->u, g->u, 4);
+  SetAgeSel(&bg->w, g->w, 3);
+  SetAgeSel(&bg->x, g->x, 3);
+  for (e = 0; e < 4; e++)
+  {
+    SetAgeSel(&bg->v[e], g->v[e], 4);
+    SetAgeSel(&bg->y[e], g->y[e], 3);
+    SetAgeSel(&bg->z[e], g->z[e], 3);
+  }
+}
+
+/* Look up one bit of a table entry for every cell at once, given the
+   four one-hot age planes of the mite whose age indexes the table. */
+static uint64_t Select(const AgeSel *s, int b, const uint64_t *age)
+{
+  return (s->bit[b][0] & age[0]) | (s->bit[b][1] & age[1]) |
+         (s->bit[b][2] & age[2]) | (s->bit[b][3] & age[3]);
+}
+
+/* Bring the contents of the neighbor in direction d onto each cell. */
+static void Shift(const Plane p, Plane out, int d)
+{
+  int k;
+
+  switch (d)
+  {
+  case East: /* (x + 1, y) */
+    for (k = 0; k < NW; k++)
+      out[k] = p[k] >> 1;
+    break;
+  case West: /* (x - 1, y) */
+    for (k = 0; k < NW; k++)
+      out[k] = (p[k] << 1) & WORD_MASK;
+    break;
+  case North: /* (x, y - 1) */
+    for (k = NW - 1; k > 0; k--)
+      out[k] = ((p[k] << ROW_BITS) | (p[k - 1] >> (2 * ROW_BITS))) &
+               WORD_MASK;
+    out[0] = (p[0] << ROW_BITS) & WORD_MASK;
+    break;
+  case South: /* (x, y + 1) */
+    for (k = 0; k < NW - 1; k++)
+      out[k] = ((p[k] >> ROW_BITS) | (p[k + 1] << (2 * ROW_BITS))) &
+               WORD_MASK;
+    out[NW - 1] = p[NW - 1] >> ROW_BITS;
+    break;
+  }
+}
+
+static void SetInterior(Plane interior, Plane barrier[4])
+{
+  Plane shifted;
+  int k, d;
+
+  for (k = 0; k < NW; k++)
+    interior[k] = ROW_INTERIOR | (ROW_INTERIOR << ROW_BITS) |
+                  (ROW_INTERIOR << (2 * ROW_BITS));
+  /* barrier[d] marks interior cells whose neighbor in direction d is
+     off the board. */
+  for (d = 0; d < Num_dirs; d++)
+  {
+    Shift(interior, shifted, d);
+    for (k = 0; k < NW; k++)
+      barrier[d][k] = interior[k] & ~shifted[k];
+  }
+}
+
+static void SetBit(Plane p, int x, int y)
+{
+  int r = y - 1;
+  p[r / 3] |= ((uint64_t)1) << ((r % 3) * ROW_BITS + x);
+}
+
+/* *******************************************************************
+ * Same as ComputeNewWorld, one round over bit planes, tallying what
+ * happened in stats unless it is NULL.
+ * *******************************************************************/
+static void ComputeNewBitWorld(const BitWorld *old, BitWorld *new,
+                               const BitGene *gs, const Plane interior,
+                               Plane barrier[4], int *count, PacStats *stats)
+{
+  /* Neighbor planes, indexed by the direction of the neighbor. */
+  Plane ns1[4], ns2[4], nd0[4], nd1[4], na0[4], na1[4];
+  int d, k;
+
+  for (d = 0; d < Num_dirs; d++)
+  {
+    Shift(old->s1, ns1[d], d);
+    Shift(old->s2, ns2[d], d);
+    Shift(old->d0, nd0[d], d);
+    Shift(old->d1, nd1[d], d);
+    Shift(old->a0, na0[d], d);
+    Shift(old->a1, na1[d], d);
+  }
+
+  count[Species1] = 0;
+  count[Species2] = 0;
+  for (k = 0; k < NW; k++)
+  {
+    uint64_t s1 = old->s1[k], s2 = old->s2[k];
+    uint64_t d0 = old->d0[k], d1 = old->d1[k];
+    uint64_t a0 = old->a0[k], a1 = old->a1[k];
+    uint64_t mite = s1 | s2;
+    uint64_t blob = interior[k] & ~mite;
+    uint64_t att[4], top[4];
+    uint64_t has[4] = {0, 0, 0, 0}, max0, max1, maxage[4];
+    uint64_t odd, many, one, ts1, ts2, b0, b1;
+    uint64_t face[4], age[4];
+    uint64_t f1 = 0, f2 = 0, fd0 = 0, fd1 = 0, fbar = 0, fblob;
+    uint64_t r0, r1, rel[4], e0, e1, esel[4];
+    uint64_t enemy, birth, conv, aging, bc;
+    uint64_t t0 = 0, t1 = 0, base0, base1, n1, n2;
+    int s, e;
+
+    /* Who attacks: a neighbor mite facing back at this cell. */
+    for (d = 0; d < Num_dirs; d++)
+    {
+      int od = opdir_bits[d];
+      uint64_t dm0 = (od & 1) ? nd0[d][k] : ~nd0[d][k];
+      uint64_t dm1 = (od & 2) ? nd1[d][k] : ~nd1[d][k];
+
+      att[d] = (ns1[d][k] | ns2[d][k]) & dm0 & dm1;
+      has[3] |= att[d] & na1[d][k] & na0[d][k];
+      has[2] |= att[d] & na1[d][k] & ~na0[d][k];
+      has[1] |= att[d] & ~na1[d][k] & na0[d][k];
+      has[0] |= att[d] & ~na1[d][k] & ~na0[d][k];
+    }
+
+    /* The oldest attackers win; count how many share that age. */
+    max1 = has[3] | has[2];
+    max0 = has[3] | (~has[2] & has[1]);
+    maxage[3] = has[3];
+    maxage[2] = has[2] & ~has[3];
+    maxage[1] = has[1] & ~max1;
+    maxage[0] = has[0] & ~max1 & ~has[1];
+    ts1 = ts2 = 0;
+    for (d = 0; d < Num_dirs; d++)
+    {
+      top[d] = att[d] & ~(na0[d][k] ^ max0) & ~(na1[d][k] ^ max1);
+      ts1 |= top[d] & ns1[d][k];
+      ts2 |= top[d] & ns2[d][k];
+    }
+    odd = top[0] ^ top[1] ^ top[2] ^ top[3];
+    many = (top[0] & (top[1] | top[2] | top[3])) |
+           (top[1] & (top[2] | top[3])) | (top[2] & top[3]);
+    one = odd & ~many;
+    /* Direction of the unique attacker. */
+    b0 = top[1] | top[3];
+    b1 = top[0] | top[1];
+
+    enemy = (s1 & ts2) | (s2 & ts1);
+    birth = blob & one;
+    conv = enemy & one;
+    bc = birth | conv;
+    /* Survivors that are not too old get a round older. */
+    aging = mite & ~enemy & ~(a1 & a0);
+    if (stats != NULL)
+    {
+      stats->cells += popcount64(mite);
+      stats->births += popcount64(birth);
+      stats->conversions += popcount64(conv);
+      stats->blowaways += popcount64(enemy & ~one);
+      stats->old_age_deaths += popcount64(mite & ~enemy & a1 & a0);
+    }
+
+    age[0] = ~a1 & ~a0;
+    age[1] = ~a1 & a0;
+    age[2] = a1 & ~a0;
+    age[3] = a1 & a0;
+
+    /* Births and conversions turn the new mite by u or v. */
+    e0 = d0 ^ b0;
+    e1 = d1 ^ b1 ^ (~d0 & b0);
+    esel[0] = ~e1 & ~e0;
+    esel[1] = ~e1 & e0;
+    esel[2] = e1 & ~e0;
+    esel[3] = e1 & e0;
+    for (s = 0; s < 2; s++)
+    {
+      const BitGene *g = &gs[s];
+      uint64_t mb = birth & (s ? ts2 : ts1);
+      uint64_t mc = conv & (s ? ts2 : ts1);
+
+      t0 |= mb & Select(&g->u, 0, maxage);
+      t1 |= mb & Select(&g->u, 1, maxage);
+      for (e = 0; e < 4; e++)
+      {
+        t0 |= mc & esel[e] & Select(&g->v[e], 0, maxage);
+        t1 |= mc & esel[e] & Select(&g->v[e], 1, maxage);
+      }
+    }
+
+    /* What each aging mite is facing. */
+    face[0] = ~d1 & ~d0;
+    face[1] = ~d1 & d0;
+    face[2] = d1 & ~d0;
+    face[3] = d1 & d0;
+    for (d = 0; d < Num_dirs; d++)
+    {
+      f1 |= face[d] & ns1[d][k];
+      f2 |= face[d] & ns2[d][k];
+      fd0 |= face[d] & nd0[d][k];
+      fd1 |= face[d] & nd1[d][k];
+      fbar |= face[d] & barrier[d][k];
+    }
+    fblob = ~fbar & ~f1 & ~f2;
+    r0 = fd0 ^ d0;
+    r1 = fd1 ^ d1 ^ (~fd0 & d0);
+    rel[0] = ~r1 & ~r0;
+    rel[1] = ~r1 & r0;
+    rel[2] = r1 & ~r0;
+    rel[3] = r1 & r0;
+    for (s = 0; s < 2; s++)
+    {
+      const BitGene *g = &gs[s];
+      uint64_t m = aging & (s ? s2 : s1);
+      uint64_t same = s ? f2 : f1, other = s ? f1 : f2;
+
+      t0 |= m & fbar & Select(&g->w, 0, age);
+      t1 |= m & fbar & Select(&g->w, 1, age);
+      t0 |= m & fblob & Select(&g->x, 0, age);
+      t1 |= m & fblob & Select(&g->x, 1, age);
+      for (e = 0; e < 4; e++)
+      {
+        uint64_t ms = m & same & rel[e], mo = m & other & rel[e];
+
+        t0 |= (ms & Select(&g->y[e], 0, age)) | (mo & Select(&g->z[e], 0, age));
+        t1 |= (ms & Select(&g->y[e], 1, age)) | (mo & Select(&g->z[e], 1, age));
+      }
+    }
+
+    /* New direction is the base direction plus the turn. */
+    base0 = (bc & b0) | (aging & d0);
+    base1 = (bc & b1) | (aging & d1);
+    n1 = (bc & ts1) | (aging & s1);
+    n2 = (bc & ts2) | (aging & s2);
+    new->s1[k] = n1;
+    new->s2[k] = n2;
+    new->d0[k] = (base0 ^ t0) & (n1 | n2);
+    new->d1[k] = (base1 ^ t1 ^ (base0 & t0)) & (n1 | n2);
+    new->a0[k] = aging & ~a0;
+    new->a1[k] = aging & (a1 ^ a0);
+    count[Species1] += popcount64(n1);
+    count[Species2] += popcount64(n2);
+  }
+}
+
+static void PrepBitDuel(BitWorld *w)
+{
+  memset(w, 0, sizeof(*w));
+  SetBit(w->s1, 5, 5); /* age 0, facing East */
+  SetBit(w->s2, 15, 5); /* age 0, facing West */
+  SetBit(w->d1, 15, 5);
+}
+
+/* *******************************************************************
+ * Run a duel between species with genes g1 & g2 for at most *rounds,
+ * exactly like FastDuel but on the bit-plane engine.  Bit worlds are
+ * canonical (no leftover bits on empty cells), so the cycle check is
+ * a plain memcmp.
+ * *******************************************************************/
+void FastDuelBits(PacGenePtr g1, PacGenePtr g2, int *rounds, int *count1,
+                  int *count2)
+{
+  BitWorld w[2], seen;
+  BitGene g[2];
+  Plane interior, barrier[4];
+  int round = 0;
+  int count[2] = {1, 1};
+  int order = 0;
+  int seen_round = 0, power = 1;
+  int(*hist)[2] = NULL;
+  PacStats st, *stats = NULL;
+
+  if (CollectStats)
+  {
+    memset(&st, 0, sizeof(st));
+    stats = &st;
+  }
+  SetBitGene(g1, &g[0]);
+  SetBitGene(g2, &g[1]);
+  SetInterior(interior, barrier);
+  PrepBitDuel(&w[0]);
+  if (DetectCycles && *rounds > 0)
+    hist = malloc((*rounds + 1) * sizeof(*hist));
+  if (hist != NULL)
+  {
+    hist[0][0] = hist[0][1] = 1;
+    seen = w[0];
+  }
+  while (round < *rounds && (count[0] > 0 && count[1] > 0))
+  {
+    ComputeNewBitWorld(&w[order], &w[1 - order], g, interior, barrier, count,
+                       stats);
+    order = 1 - order;
+    round++;
+    if (stats != NULL)
+      stats->rounds++;
+    if (hist == NULL)
+      continue;
+
+    /* Same checkpointing as FastDuel. */
+    hist[round][0] = count[0];
+    hist[round][1] = count[1];
+    if (count[0] == hist[seen_round][0] && count[1] == hist[seen_round][1] &&
+        memcmp(&w[order], &seen, sizeof(BitWorld)) == 0)
+    {
+      int then = seen_round + (*rounds - seen_round) % (round - seen_round);
+      count[0] = hist[then][0];
+      count[1] = hist[then][1];
+      if (stats != NULL)
+      {
+        stats->cycle_exits++;
+        stats->rounds_skipped += *rounds - round;
+      }
+      round = *rounds;
+      break;
+    }
+    if (round - seen_round == power)
+    {
+      seen = w[order];
+      seen_round = round;
+      if (power < MaxPeriod)
+        power *= 2;
+    }
+  }
+  free(hist);
+  if (stats != NULL)
+  {
+    stats->duels = 1;
+    MergeStats(stats);
+  }
+
+  *count1 = count[0];
+  *count2 = count[1];
+  *rounds = round;
+}
@@ -2,6 +2,9 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#ifdef _MSC_VER
+#include <windows.h>
+#endif
 
 #include "PacWar.h"
 
@@ -56,15 +59,21 @@ char *NewStringFromGene(PacGenePtr g, char *s)
   return s;
 }
 
+/* Read a gene table entry of species k, and if used is not NULL, set the
+   bit of that locus (its offset within the PacGene) in used[k]. */
+#define GENE_READ(k, entry)                                             \
+  (used != NULL                                                         \
+       ? (used[k] |= 1ULL << (&(entry) - (signed char *)gs[k]), (entry)) \
+       : (entry))
+
 /* *******************************************************************
- * Given the old World, compute the New one where gs is an array of
- * 2 PacGenes, and count is an array fo 2 integers that will be set to
- * the number of mites of each species that are present in the new
- * world.  Draw is a pointer to a function called to update cells that
- * change.
+ * ComputeNewWorld, optionally recording in used[0] and used[1] which
+ * loci of each gene were read this round, and tallying what happened
+ * in stats (see PacWar.h) unless it is NULL.
  * *******************************************************************/
-void ComputeNewWorld(World *old, World *new, PacGenePtr *gs, int *count,
-                     void (*draw)(int x, int y, Cell c))
+static void StepWorld(World *old, World *new, PacGenePtr *gs, int *count,
+                      void (*draw)(int x, int y, Cell c),
+                      unsigned long long *used, PacStats *stats)
 {
   int x, y, d;
 
@@ -80,6 +89,9 @@ void ComputeNewWorld(World *old, World *new, PacGenePtr *gs, int *count,
       int other_species = (spot.kind == Species1 ? Species2 : Species1);
       PacGenePtr g = *(gs + spot.kind);
 
+      if (stats != NULL && spot.kind <= Species2)
+        stats->cells++;
+
       for (d = 0; d < Num_dirs; d++)
       {
         Cell neighbor = (*old)[x + dx[d]][y + dy[d]];
@@ -104,7 +116,11 @@ void ComputeNewWorld(World *old, World *new, PacGenePtr *gs, int *count,
         if (num_attack == 1)
         {
           /* We have a brith! */
-          enemy.dir = (enemy.dir + gs[enemy.kind]->u[enemy.age]) % 4;
+          if (stats != NULL)
+            stats->births++;
+          enemy.dir =
+              (enemy.dir + GENE_READ(enemy.kind, gs[enemy.kind]->u[enemy.age])) %
+              4;
           enemy.age = 0;
           spot = enemy;
         }
@@ -114,6 +130,8 @@ void ComputeNewWorld(World *old, World *new, PacGenePtr *gs, int *count,
         if (num_attack > 1)
         {
           /* Blow spot away */
+          if (stats != NULL)
+            stats->blowaways++;
           spot.kind = Blob;
           spot.age = -1;
         }
@@ -121,7 +139,11 @@ void ComputeNewWorld(World *old, World *new, PacGenePtr *gs, int *count,
         {
           /* Unique enemy attacker "converts" spot */
           int e = (spot.dir - enemy.dir + 4) % 4;
-          enemy.dir = (enemy.dir + gs[enemy.kind]->v[e][enemy.age]) % 4;
+          if (stats != NULL)
+            stats->conversions++;
+          enemy.dir = (enemy.dir + GENE_READ(enemy.kind,
+                                             gs[enemy.kind]->v[e][enemy.age])) %
+                      4;
           enemy.age = 0;
           spot = enemy;
         }
@@ -129,6 +151,8 @@ void ComputeNewWorld(World *old, World *new, PacGenePtr *gs, int *count,
       else if (spot.age == 3)
       {
         /* Spot dies of old age */
+        if (stats != NULL)
+          stats->old_age_deaths++;
         spot.kind = Blob;
         spot.age = -1;
       }
@@ -140,18 +164,20 @@ void ComputeNewWorld(World *old, World *new, PacGenePtr *gs, int *count,
         switch (neighbor.kind)
         {
         case Barrier:
-          spot.dir = (spot.dir + g->w[spot.age]) % 4;
+          spot.dir = (spot.dir + GENE_READ(spot.kind, g->w[spot.age])) % 4;
           break;
         case Blob:
-          spot.dir = (spot.dir + g->x[spot.age]) % 4;
+          spot.dir = (spot.dir + GENE_READ(spot.kind, g->x[spot.age])) % 4;
           break;
         case Species1:
         case Species2:
           e = (neighbor.dir - spot.dir + 4) % 4;
           if (neighbor.kind == spot.kind)
-            spot.dir = (spot.dir + g->y[e][spot.age]) % 4;
+            spot.dir =
+                (spot.dir + GENE_READ(spot.kind, g->y[e][spot.age])) % 4;
           else
-            spot.dir = (spot.dir + g->z[e][spot.age]) % 4;
+            spot.dir =
+                (spot.dir + GENE_READ(spot.kind, g->z[e][spot.age])) % 4;
         }
         spot.age++;
       }
@@ -166,6 +192,20 @@ void ComputeNewWorld(World *old, World *new, PacGenePtr *gs, int *count,
   }
 }
 
+/* *******************************************************************
+ * Given the old World, compute the New one where gs is an array of
+ * 2 PacGenes, and count is an array fo 2 integers that will be set to
+ * the number of mites of each species that are present in the new
+ * world.  Draw is a pointer to a function called to update cells that
+ * change.
+ * *******************************************************************/
+void ComputeNewWorld(World *old, World *new, PacGenePtr *gs, int *count,
+                     void (*draw)(int x, int y, Cell c))
+{
+  StepWorld(old, new, gs, count, draw, NULL, NULL);
+}
+
+
 /* *******************************************************************
  * Initialize the two worlds (only do barrier for second)
  * *******************************************************************/
@@ -223,19 +263,201 @@ void PrepDuel(World *w1, World *w2, void (*draw)(int, int, Cell))
   }
 }
 
+/* *******************************************************************
+ * Whether FastDuel looks for worlds that repeat (see PacWar.h).
+ * *******************************************************************/
+int DetectCycles = 1;
+
+/* *******************************************************************
+ * Engine counters (see PacWar.h), merged with atomic adds.
+ * *******************************************************************/
+int CollectStats = 0;
+static PacStats TotalStats;
+
+#ifdef _MSC_VER
+#define STAT_ADD(field, v) \
+  InterlockedExchangeAdd64((volatile LONG64 *)&TotalStats.field, (v))
+#define STAT_LOAD(field) \
+  InterlockedCompareExchange64((volatile LONG64 *)&TotalStats.field, 0, 0)
+#define STAT_CLEAR(field) \
+  InterlockedExchange64((volatile LONG64 *)&TotalStats.field, 0)
+#else
+#define STAT_ADD(field, v) \
+  __atomic_fetch_add(&TotalStats.field, (v), __ATOMIC_RELAXED)
+#define STAT_LOAD(field) __atomic_load_n(&TotalStats.field, __ATOMIC_RELAXED)
+#define STAT_CLEAR(field) \
+  __atomic_store_n(&TotalStats.field, 0, __ATOMIC_RELAXED)
+#endif
+
+#define FOR_EACH_STAT(X)                                                    \
+  X(duels) X(rounds) X(cells) X(births) X(conversions) X(blowaways)       \
+      X(old_age_deaths) X(cycle_exits) X(rounds_skipped)
+
+void MergeStats(const PacStats *s)
+{
+#define ADD_STAT(field) STAT_ADD(field, s->field);
+  FOR_EACH_STAT(ADD_STAT)
+#undef ADD_STAT
+}
+
+void GetStats(PacStats *s)
+{
+#define LOAD_STAT(field) s->field = STAT_LOAD(field);
+  FOR_EACH_STAT(LOAD_STAT)
+#undef LOAD_STAT
+}
+
+void ResetStats(void)
+{
+#define CLEAR_STAT(field) STAT_CLEAR(field);
+  FOR_EACH_STAT(CLEAR_STAT)
+#undef CLEAR_STAT
+}
+
+/* *******************************************************************
+ * Do two worlds hold the same mites?  The dir of a blob is left over
+ * from whatever died there and never read again, so it is ignored.
+ * *******************************************************************/
+static int SameWorld(World *a, World *b)
+{
+  int x, y;
+
+  for (x = 1; x < MaxX - 1; x++)
+  {
+    for (y = 1; y < MaxY - 1; y++)
+    {
+      Cell c = (*a)[x][y], d = (*b)[x][y];
+      if (c.kind != d.kind ||
+          (c.kind <= Species2 && (c.dir != d.dir || c.age != d.age)))
+        return 0;
+    }
+  }
+  return 1;
+}
+
 /* *******************************************************************
  * Run a duel between species with genes g1 & g2 for at most *rounds.
  * When done, *rounds will be the number of rounds actually required,
  * *count1 & *count2 will be the number of each species of mite still
  * standing when done.
+ *
+ * With DetectCycles set, the world is checkpointed Brent-style (after
+ * 1, 2, 4, ... rounds, then every MaxPeriod rounds) and each new world
+ * is compared against the checkpoint, species counts first so the check
+ * is nearly free.  Once they match, the duel is periodic from then on
+ * and the counts at round *rounds are read from the count history.
+ *
+ * If used is not NULL, the loci read are recorded as in StepWorld.  The
+ * rounds skipped by a cycle only repeat transitions already simulated,
+ * so they would not read anything new.
  * *******************************************************************/
+static void RunDuel(PacGenePtr g1, PacGenePtr g2, int *rounds, int *count1,
+                    int *count2, unsigned long long *used)
+{
+  World w[2], seen;
+  int round = 0;
+  int count[2] = {1, 1};
+  int order = 0;
+  int seen_round = 0, power = 1;
+  int(*hist)[2] = NULL;
+  PacGenePtr g[2] = {g1, g2};
+  PacStats st, *stats = NULL;
+
+  if (CollectStats)
+  {
+    memset(&st, 0, sizeof(st));
+    stats = &st;
+  }
+  PrepDuel(&(w[0]), &(w[1]), NULL);
+  if (DetectCycles && *rounds > 0)
+    hist = malloc((*rounds + 1) * sizeof(*hist));
+  if (hist != NULL)
+  {
+    hist[0][0] = hist[0][1] = 1;
+    memcpy(&seen, &(w[0]), sizeof(World));
+  }
+  while (round < *rounds && (count[0] > 0 && count[1] > 0))
+  {
+    StepWorld(&(w[order]), &(w[1 - order]), g, count, NULL, used, stats);
+    order = 1 - order;
+    round++;
+    if (stats != NULL)
+      stats->rounds++;
+    if (hist == NULL)
+      continue;
+
+    hist[round][0] = count[0];
+    hist[round][1] = count[1];
+    if (count[0] == hist[seen_round][0] && count[1] == hist[seen_round][1] &&
+        SameWorld(&(w[order]), &seen))
+    {
+      /* Every world from here on repeats one since the checkpoint, all
+         of which have both species alive, so the duel runs to the end. */
+      int then = seen_round + (*rounds - seen_round) % (round - seen_round);
+      count[0] = hist[then][0];
+      count[1] = hist[then][1];
+      if (stats != NULL)
+      {
+        stats->cycle_exits++;
+        stats->rounds_skipped += *rounds - round;
+      }
+      round = *rounds;
+      break;
+    }
+    if (round - seen_round == power)
+    {
+      memcpy(&seen, &(w[order]), sizeof(World));
+      seen_round = round;
+      if (power < MaxPeriod)
+        power *= 2;
+    }
+  }
+  free(hist);
+  if (stats != NULL)
+  {
+    stats->duels = 1;
+    MergeStats(stats);
+  }
+
+  *count1 = count[0];
+  *count2 = count[1];
+  *rounds = round;
+}
+
 void FastDuel(PacGenePtr g1, PacGenePtr g2, int *rounds, int *count1,
               int *count2)
+{
+  RunDuel(g1, g2, rounds, count1, count2, NULL);
+}
+
+/* *******************************************************************
+ * Same as FastDuel, and also sets bit i of *used1 (*used2) if locus i
+ * of g1 (g2) was read at any point in the duel.  Changing a locus that
+ * was never read cannot change the outcome.
+ * *******************************************************************/
+void TraceDuel(PacGenePtr g1, PacGenePtr g2, int *rounds, int *count1,
+               int *count2, unsigned long long *used1,
+               unsigned long long *used2)
+{
+  unsigned long long used[2] = {0, 0};
+
+  RunDuel(g1, g2, rounds, count1, count2, used);
+  *used1 = used[0];
+  *used2 = used[1];
+}
+
+/* *******************************************************************
+ * FastDuel with a per-round record of the counts, and optionally of
+ * the packed worlds (see PacWar.h).
+ * *******************************************************************/
+void TrajectoryDuel(PacGenePtr g1, PacGenePtr g2, int *rounds,
+                    int (*counts)[2], unsigned char *snaps)
 {
   World w[2];
   int round = 0;
   int count[2] = {1, 1};
   int order = 0;
+  int x, y;
   PacGenePtr g[2] = {g1, g2};
 
   PrepDuel(&(w[0]), &(w[1]), NULL);
@@ -243,11 +465,23 @@ void FastDuel(PacGenePtr g1, PacGenePtr g2, int *rounds, int *count1,
   {
     ComputeNewWorld(&(w[order]), &(w[1 - order]), g, count, NULL);
     order = 1 - order;
+    counts[round][0] = count[0];
+    counts[round][1] = count[1];
+    if (snaps != NULL)
+    {
+      for (x = 1; x < MaxX - 1; x++)
+      {
+        for (y = 1; y < MaxY - 1; y++)
+        {
+          Cell c = w[order][x][y];
+          int dir = c.kind <= Species2 ? c.dir : 0;
+          *snaps++ = (unsigned char)(c.kind | dir << 2 | (c.age + 1) << 4);
+        }
+      }
+    }
     round++;
   }
 
-  *count1 = count[0];
-  *count2 = count[1];
   *rounds = round;
 }
 
@@ -2,15 +2,164 @@
 #include <numpy/arrayobject.h>
 #include "PacWar.h"
 
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <pthread.h>
+#include <unistd.h>
+#endif
+
 static char module_docstring[] =
     "This module provides an interface for battling between two genes.";
 static char battle_docstring[] =
-    "Battle two genes and return the statistics of result.";
+    "battle(g1, g2, rounds=500)\n\n"
+    "Battle two genes and return the statistics of result. The duel stops "
+    "after `rounds` rounds at the latest. Every entry point takes genes as "
+    "50 alleles in 0..3: bytes, gene.Gene and uint8 arrays are read in "
+    "place, anything else (lists, other arrays) is converted.";
+static char battle_many_docstring[] =
+    "battle_many(genes_a, genes_b, rounds=500)\n\n"
+    "Battle the rows of two (N, 50) gene matrices pairwise and return an "
+    "(N, 3) array of (rounds, count1, count2). Either argument may also be "
+    "a single gene, which is then battled against every row of the other. "
+    "Every duel stops after `rounds` rounds at the latest.";
+static char battle_loci_docstring[] =
+    "battle_loci(g1, g2)\n\n"
+    "Battle two genes like battle() and also report which gene loci the "
+    "simulation read. Returns (rounds, count1, count2, used1, used2) where "
+    "bit i of the int used1 (used2) is set if locus i of g1 (g2) was "
+    "consulted; changing a locus whose bit is clear cannot change the "
+    "result. Always runs on the 'cell' engine.";
+static char battle_many_loci_docstring[] =
+    "battle_many_loci(genes_a, genes_b, rounds=500)\n\n"
+    "battle_loci over the rows of two (N, 50) gene matrices, broadcast "
+    "like battle_many(). Returns (results, used): results is the (N, 3) "
+    "array of (rounds, count1, count2) and used the (N, 2) uint64 array of "
+    "the used1 / used2 masks. Every duel stops after `rounds` rounds at "
+    "the latest. Always runs on the 'cell' engine.";
+static char battle_trace_docstring[] =
+    "battle_trace(g1, g2, rounds=500, snapshots=False)\n\n"
+    "Battle two genes like battle() and return the (R, 2) int array of "
+    "the species counts after each of the R rounds played (every round is "
+    "simulated, cycles are never skipped). With snapshots=True, return "
+    "(counts, worlds) where worlds is an (R, 19, 9) uint8 array of the "
+    "interior after each round, each cell packed as kind | dir << 2 | "
+    "(age + 1) << 4 (see batchsim.unpack_snapshots). Always runs on the "
+    "'cell' engine.";
+static char round_robin_docstring[] =
+    "round_robin(genes, threads=0)\n\n"
+    "Battle every pair of rows of an (N, 50) gene matrix and return a tuple "
+    "(results, points). results is an (N, N, 3) array whose [i, j] entry is "
+    "(rounds, count_i, count_j) with gene i as the first species; points is "
+    "an (N, N) array of the tournament points gene i earned against gene j. "
+    "Pairs are split over `threads` native threads (0 means one per CPU).";
+static char neighborhood_docstring[] =
+    "neighborhood(gene, opponents, threshold=None, threads=0)\n\n"
+    "Battle all 150 single-locus neighbors of `gene` against every row of "
+    "the (M, 50) `opponents` matrix. Neighbor k changes locus k // 3 to the "
+    "(k % 3)-th allele other than the current one, in increasing order. "
+    "Returns (scores, results): scores is a (150,) float array of each "
+    "neighbor's mean over opponents of points + 0.01 * (count_me - "
+    "count_opp), with points as in myGene.duel_points; results is the "
+    "(150, M, 3) array of (rounds, count_me, count_opp). With a threshold, "
+    "neighbors after the first one scoring above it are skipped; their "
+    "scores are NaN. Scores are whole hundredths, so a score counts as "
+    "above the threshold only when it exceeds it by more than 1e-6 / (100 "
+    "* M): a neighbor that ties a threshold computed as such a mean (e.g. "
+    "myGene.evaluate of the current gene) is not taken for an improvement "
+    "because of rounding. Neighbors are split over `threads` native "
+    "threads (0 means one per CPU).";
+
+static char set_engine_docstring[] =
+    "set_engine(name)\n\n"
+    "Select the duel engine used by every entry point: 'cell' (the "
+    "original World of Cells) or 'bitplane' (packed bit planes, see "
+    "PacWarBits.c). Both give identical results.";
+static char get_engine_docstring[] =
+    "Return the name of the duel engine currently in use.";
+static char set_cycle_detection_docstring[] =
+    "set_cycle_detection(on)\n\n"
+    "Enable or disable ending duels early once the world repeats itself "
+    "(a fixed point or a short cycle). Results are identical either way; "
+    "detection is on by default.";
+static char get_cycle_detection_docstring[] =
+    "Return whether duels end early on repeating worlds.";
+static char set_collect_stats_docstring[] =
+    "set_collect_stats(on)\n\n"
+    "Enable or disable the engine counters read by stats(). They are off "
+    "by default; while off they cost next to nothing.";
+static char get_collect_stats_docstring[] =
+    "Return whether the engine counters are being collected.";
+static char stats_docstring[] =
+    "stats()\n\n"
+    "Return the engine counters accumulated since the last reset_stats() "
+    "as a dict: duels, rounds (simulated), cells (mite cells updated), "
+    "births, conversions, blowaways, old_age_deaths, cycle_exits (duels "
+    "ended early by cycle detection) and rounds_skipped (by those exits).";
+static char reset_stats_docstring[] =
+    "Zero the engine counters.";
+
+static PyObject *battle_PyPacwar(PyObject *self, PyObject *args,
+                                 PyObject *kwds);
+static PyObject *battle_many_PyPacwar(PyObject *self, PyObject *args,
+                                      PyObject *kwds);
+static PyObject *battle_loci_PyPacwar(PyObject *self, PyObject *args);
+static PyObject *battle_many_loci_PyPacwar(PyObject *self, PyObject *args,
+                                           PyObject *kwds);
+static PyObject *battle_trace_PyPacwar(PyObject *self, PyObject *args,
+                                       PyObject *kwds);
+static PyObject *round_robin_PyPacwar(PyObject *self, PyObject *args,
+                                      PyObject *kwds);
+static PyObject *neighborhood_PyPacwar(PyObject *self, PyObject *args,
+                                       PyObject *kwds);
+static PyObject *set_engine_PyPacwar(PyObject *self, PyObject *args);
+static PyObject *get_engine_PyPacwar(PyObject *self, PyObject *unused);
+static PyObject *set_cycle_detection_PyPacwar(PyObject *self, PyObject *args);
+static PyObject *get_cycle_detection_PyPacwar(PyObject *self,
+                                              PyObject *unused);
+static PyObject *set_collect_stats_PyPacwar(PyObject *self, PyObject *args);
+static PyObject *get_collect_stats_PyPacwar(PyObject *self, PyObject *unused);
+static PyObject *stats_PyPacwar(PyObject *self, PyObject *unused);
+static PyObject *reset_stats_PyPacwar(PyObject *self, PyObject *unused);
 
-static PyObject *battle_PyPacwar(PyObject *self, PyObject *args);
+/* The duel engines that can be selected at runtime. */
+typedef void (*duel_fn)(PacGenePtr g1, PacGenePtr g2, int *rounds,
+                        int *count1, int *count2);
+
+static const struct
+{
+  const char *name;
+  duel_fn fn;
+} engines[] = {{"cell", FastDuel}, {"bitplane", FastDuelBits}};
+
+static duel_fn engine = FastDuel;
 
 static PyMethodDef module_methods[] = {
-    {"battle", battle_PyPacwar, METH_VARARGS, battle_docstring},
+    {"battle", (PyCFunction)(void (*)(void))battle_PyPacwar,
+     METH_VARARGS | METH_KEYWORDS, battle_docstring},
+    {"battle_many", (PyCFunction)(void (*)(void))battle_many_PyPacwar,
+     METH_VARARGS | METH_KEYWORDS, battle_many_docstring},
+    {"battle_loci", battle_loci_PyPacwar, METH_VARARGS, battle_loci_docstring},
+    {"battle_many_loci", (PyCFunction)(void (*)(void))battle_many_loci_PyPacwar,
+     METH_VARARGS | METH_KEYWORDS, battle_many_loci_docstring},
+    {"battle_trace", (PyCFunction)(void (*)(void))battle_trace_PyPacwar,
+     METH_VARARGS | METH_KEYWORDS, battle_trace_docstring},
+    {"round_robin", (PyCFunction)(void (*)(void))round_robin_PyPacwar,
+     METH_VARARGS | METH_KEYWORDS, round_robin_docstring},
+    {"neighborhood", (PyCFunction)(void (*)(void))neighborhood_PyPacwar,
+     METH_VARARGS | METH_KEYWORDS, neighborhood_docstring},
+    {"set_engine", set_engine_PyPacwar, METH_VARARGS, set_engine_docstring},
+    {"get_engine", get_engine_PyPacwar, METH_NOARGS, get_engine_docstring},
+    {"set_cycle_detection", set_cycle_detection_PyPacwar, METH_VARARGS,
+     set_cycle_detection_docstring},
+    {"get_cycle_detection", get_cycle_detection_PyPacwar, METH_NOARGS,
+     get_cycle_detection_docstring},
+    {"set_collect_stats", set_collect_stats_PyPacwar, METH_VARARGS,
+     set_collect_stats_docstring},
+    {"get_collect_stats", get_collect_stats_PyPacwar, METH_NOARGS,
+     get_collect_stats_docstring},
+    {"stats", stats_PyPacwar, METH_NOARGS, stats_docstring},
+    {"reset_stats", reset_stats_PyPacwar, METH_NOARGS, reset_stats_docstring},
     {NULL, NULL, 0, NULL}};
 
 static PyModuleDef module_def = {
@@ -31,57 +180,940 @@ PyMODINIT_FUNC PyInit__PyPacwar(void)
   return m;
 }
 
-static PyObject *battle_PyPacwar(PyObject *self, PyObject *args)
+/* Fill a PacGene straight from 50 ints, skipping the string round trip.
+   Returns 0 if an allele is out of range.  Does not touch the Python API,
+   so it is safe to call with the GIL released. */
+static int gene_from_ints(const int *src, PacGenePtr g)
+{
+  signed char *gs = (signed char *)g;
+  int i;
+
+  for (i = 0; i < 50; i++)
+  {
+    if (src[i] < 0 || src[i] > 3)
+      return 0;
+    gs[i] = (signed char)src[i];
+  }
+  return 1;
+}
+
+/* Same for 50 bytes. */
+static int gene_from_bytes(const unsigned char *src, PacGenePtr g)
+{
+  signed char *gs = (signed char *)g;
+  int i;
+
+  for (i = 0; i < 50; i++)
+  {
+    if (src[i] > 3)
+      return 0;
+    gs[i] = (signed char)src[i];
+  }
+  return 1;
+}
+
+#define GENE_SHAPE_ERROR \
+  "genes must be (N, 50) matrices or single 50-long genes"
+
+/* Read one gene or a stack of genes from a Python object into a new
+   PyMem_Malloc'ed array.  Byte buffers (bytes, gene.Gene, contiguous
+   uint8 arrays) are read in place, a list or tuple of bytes gene by
+   gene, and anything else goes through NumPy as integers.  *n is set to
+   the number of genes, or -1 for a single 50-long gene.  Returns NULL
+   with an exception set on failure. */
+static PacGene *genes_from_object(PyObject *obj, npy_intp *n)
+{
+  Py_buffer view;
+  PyObject *array;
+  PacGene *genes;
+  npy_intp i, count;
+  int ok = 1;
+
+  if (PyObject_CheckBuffer(obj))
+  {
+    if (PyObject_GetBuffer(obj, &view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) <
+        0)
+      PyErr_Clear();
+    else if (view.itemsize != 1 ||
+             (view.format != NULL && strcmp(view.format, "B") != 0 &&
+              strcmp(view.format, "b") != 0))
+      PyBuffer_Release(&view);
+    else
+    {
+      if (!((view.ndim <= 1 && view.len == 50) ||
+            (view.ndim == 2 && view.shape[1] == 50)))
+      {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError, GENE_SHAPE_ERROR);
+        return NULL;
+      }
+      *n = view.ndim == 2 ? view.shape[0] : -1;
+      count = view.len / 50;
+      genes = (PacGene *)PyMem_Malloc((count ? count : 1) * sizeof(PacGene));
+      if (genes == NULL)
+      {
+        PyBuffer_Release(&view);
+        return (PacGene *)PyErr_NoMemory();
+      }
+      for (i = 0; ok && i < count; i++)
+        ok = gene_from_bytes((unsigned char *)view.buf + 50 * i, &genes[i]);
+      PyBuffer_Release(&view);
+      goto check;
+    }
+  }
+
+  if ((PyList_Check(obj) || PyTuple_Check(obj)) &&
+      PySequence_Fast_GET_SIZE(obj) > 0 &&
+      PyBytes_Check(PySequence_Fast_GET_ITEM(obj, 0)))
+  {
+    count = PySequence_Fast_GET_SIZE(obj);
+    genes = (PacGene *)PyMem_Malloc(count * sizeof(PacGene));
+    if (genes == NULL)
+      return (PacGene *)PyErr_NoMemory();
+    for (i = 0; ok && i < count; i++)
+    {
+      PyObject *item = PySequence_Fast_GET_ITEM(obj, i);
+
+      if (!PyBytes_Check(item) || PyBytes_GET_SIZE(item) != 50)
+      {
+        PyMem_Free(genes);
+        PyErr_SetString(PyExc_ValueError, GENE_SHAPE_ERROR);
+        return NULL;
+      }
+      ok = gene_from_bytes((unsigned char *)PyBytes_AS_STRING(item),
+                           &genes[i]);
+    }
+    *n = count;
+    goto check;
+  }
+
+  /* Interpret anything else as a numpy array (any integer dtype). */
+  array = PyArray_FROM_OTF(obj, NPY_INT, NPY_IN_ARRAY | NPY_FORCECAST);
+  if (array == NULL)
+    return NULL;
+  if (!((PyArray_NDIM((PyArrayObject *)array) == 1 &&
+         PyArray_SIZE((PyArrayObject *)array) == 50) ||
+        (PyArray_NDIM((PyArrayObject *)array) == 2 &&
+         PyArray_DIM((PyArrayObject *)array, 1) == 50)))
+  {
+    Py_DECREF(array);
+    PyErr_SetString(PyExc_ValueError, GENE_SHAPE_ERROR);
+    return NULL;
+  }
+  *n = PyArray_NDIM((PyArrayObject *)array) == 2
+           ? PyArray_DIM((PyArrayObject *)array, 0)
+           : -1;
+  count = PyArray_SIZE((PyArrayObject *)array) / 50;
+  genes = (PacGene *)PyMem_Malloc((count ? count : 1) * sizeof(PacGene));
+  if (genes == NULL)
+  {
+    Py_DECREF(array);
+    return (PacGene *)PyErr_NoMemory();
+  }
+  for (i = 0; ok && i < count; i++)
+    ok = gene_from_ints((int *)PyArray_DATA((PyArrayObject *)array) + 50 * i,
+                        &genes[i]);
+  Py_DECREF(array);
+
+check:
+  if (!ok)
+  {
+    PyMem_Free(genes);
+    PyErr_SetString(PyExc_ValueError, "gene alleles must be in 0..3");
+    return NULL;
+  }
+  return genes;
+}
+
+/* genes_from_object for exactly one gene.  Returns 0 with an exception
+   set on failure. */
+static int single_gene(PyObject *obj, PacGenePtr g)
+{
+  npy_intp n;
+  PacGene *genes = genes_from_object(obj, &n);
+
+  if (genes == NULL)
+    return 0;
+  if (n != -1)
+  {
+    PyMem_Free(genes);
+    PyErr_SetString(PyExc_ValueError, "expected a single 50-long gene");
+    return 0;
+  }
+  *g = genes[0];
+  PyMem_Free(genes);
+  return 1;
+}
+
+/* Tournament points for one duel, matching score.score in score.py. */
+static void score_duel(int rounds, int c1, int c2, int *s1, int *s2)
+{
+  static const int elim[4] = {20, 19, 18, 17};
+  int bucket = rounds < 100 ? 0 : rounds < 200 ? 1 : rounds < 300 ? 2 : 3;
+
+  if (c2 == 0)
+  {
+    *s1 = elim[bucket];
+    *s2 = 20 - *s1;
+    return;
+  }
+  if (c1 == 0)
+  {
+    *s2 = elim[bucket];
+    *s1 = 20 - *s2;
+    return;
+  }
+  if (rounds == 500)
+  {
+    double ratio = (double)c1 / c2, inv_ratio = (double)c2 / c1;
+
+    if (ratio >= 10.0)
+      *s1 = 13;
+    else if (ratio >= 3.0)
+      *s1 = 12;
+    else if (ratio >= 1.5)
+      *s1 = 11;
+    else if (inv_ratio >= 10.0)
+      *s1 = 7;
+    else if (inv_ratio >= 3.0)
+      *s1 = 8;
+    else if (inv_ratio >= 1.5)
+      *s1 = 9;
+    else
+      *s1 = 10;
+    *s2 = 20 - *s1;
+    return;
+  }
+  *s1 = *s2 = 10;
+}
+
+/* *******************************************************************
+ * Minimal native thread pool: run fn(arg, t, nthreads) for t in
+ * 0..nthreads-1, each on its own thread, and wait for all of them.
+ * Callers must release the GIL first and must not touch Python objects
+ * inside fn.
+ * *******************************************************************/
+typedef void (*work_fn)(void *arg, int t, int nthreads);
+
+typedef struct
+{
+  work_fn fn;
+  void *arg;
+  int t, nthreads;
+} work_item;
+
+#ifdef _WIN32
+static DWORD WINAPI work_entry(LPVOID p)
+#else
+static void *work_entry(void *p)
+#endif
+{
+  work_item *w = (work_item *)p;
+  w->fn(w->arg, w->t, w->nthreads);
+  return 0;
+}
+
+static int cpu_count(void)
 {
+#ifdef _WIN32
+  SYSTEM_INFO info;
+  GetSystemInfo(&info);
+  return (int)info.dwNumberOfProcessors;
+#else
+  long n = sysconf(_SC_NPROCESSORS_ONLN);
+  return n > 0 ? (int)n : 1;
+#endif
+}
+
+static void run_parallel(work_fn fn, void *arg, int nthreads)
+{
+  work_item *items;
+#ifdef _WIN32
+  HANDLE *threads;
+#else
+  pthread_t *threads;
+#endif
+  int t, started = 1;
+
+  if (nthreads <= 1 ||
+      (items = (work_item *)malloc(nthreads * sizeof(work_item))) == NULL)
+  {
+    fn(arg, 0, 1);
+    return;
+  }
+  threads = malloc(nthreads * sizeof(*threads));
+  if (threads == NULL)
+  {
+    free(items);
+    fn(arg, 0, 1);
+    return;
+  }
+  for (t = 0; t < nthreads; t++)
+  {
+    items[t].fn = fn;
+    items[t].arg = arg;
+    items[t].t = t;
+    items[t].nthreads = nthreads;
+  }
+  /* Thread 0's share runs on the calling thread.  If a thread cannot be
+     started, the caller picks up its share as well. */
+  for (t = 1; t < nthreads; t++)
+  {
+#ifdef _WIN32
+    threads[t] = CreateThread(NULL, 0, work_entry, &items[t], 0, NULL);
+    if (threads[t] == NULL)
+      break;
+#else
+    if (pthread_create(&threads[t], NULL, work_entry, &items[t]) != 0)
+      break;
+#endif
+    started++;
+  }
+  work_entry(&items[0]);
+  for (t = started; t < nthreads; t++)
+    work_entry(&items[t]);
+  for (t = 1; t < started; t++)
+  {
+#ifdef _WIN32
+    WaitForSingleObject(threads[t], INFINITE);
+    CloseHandle(threads[t]);
+#else
+    pthread_join(threads[t], NULL);
+#endif
+  }
+  free(threads);
+  free(items);
+}
+
+static PyObject *battle_PyPacwar(PyObject *self, PyObject *args,
+                                 PyObject *kwds)
+{
+  static char *kwlist[] = {"g1", "g2", "rounds", NULL};
   PyObject *g1_obj, *g2_obj;
-  PyObject *g1_array, *g2_array;
-  PyObject *ret;
   PacGene g[2];
-  PacGenePtr gp[2] = {&g[0], &g[1]};
-  int *g1, *g2;
-  int numrounds = 500, count[2], i;
-  char g1_str[51], g2_str[51];
+  int numrounds = 500, count[2];
+
+  /* Parse the input tuple */
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|i", kwlist, &g1_obj,
+                                   &g2_obj, &numrounds))
+    return NULL;
+  if (numrounds < 1)
+  {
+    PyErr_SetString(PyExc_ValueError, "rounds must be positive");
+    return NULL;
+  }
+  if (!single_gene(g1_obj, &g[0]) || !single_gene(g2_obj, &g[1]))
+    return NULL;
+
+  /* The simulation only touches C data, so let other threads run. */
+  Py_BEGIN_ALLOW_THREADS
+  engine(&g[0], &g[1], &numrounds, &count[0], &count[1]);
+  Py_END_ALLOW_THREADS
+
+  /* Build the output tuple */
+  return Py_BuildValue("iii", numrounds, count[0], count[1]);
+}
+
+static PyObject *battle_many_PyPacwar(PyObject *self, PyObject *args,
+                                      PyObject *kwds)
+{
+  static char *kwlist[] = {"genes_a", "genes_b", "rounds", NULL};
+  PyObject *a_obj, *b_obj, *out = NULL;
+  PacGene *a, *b = NULL;
+  npy_intp n, na, nb, i, dims[2];
+  int *res;
+  int maxrounds = 500;
+
+  /* Parse the input tuple */
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|i", kwlist, &a_obj,
+                                   &b_obj, &maxrounds))
+    return NULL;
+  if (maxrounds < 1)
+  {
+    PyErr_SetString(PyExc_ValueError, "rounds must be positive");
+    return NULL;
+  }
+
+  /* Accept (N, 50) matrices, or a single (50,) gene to broadcast. */
+  a = genes_from_object(a_obj, &na);
+  if (a == NULL)
+    return NULL;
+  b = genes_from_object(b_obj, &nb);
+  if (b == NULL)
+    goto done;
+  if (na >= 0 && nb >= 0 && na != nb)
+  {
+    PyErr_SetString(PyExc_ValueError,
+                    "gene matrices must have the same number of rows");
+    goto done;
+  }
+  n = na >= 0 ? na : (nb >= 0 ? nb : 1);
+
+  dims[0] = n;
+  dims[1] = 3;
+  out = PyArray_SimpleNew(2, dims, NPY_INT);
+  if (out == NULL)
+    goto done;
+  res = (int *)PyArray_DATA((PyArrayObject *)out);
+
+  /* Do battle, with the GIL released for the whole batch. */
+  Py_BEGIN_ALLOW_THREADS
+  for (i = 0; i < n; i++)
+  {
+    int numrounds = maxrounds, count[2];
+
+    engine(&a[na >= 0 ? i : 0], &b[nb >= 0 ? i : 0], &numrounds, &count[0],
+           &count[1]);
+    res[3 * i] = numrounds;
+    res[3 * i + 1] = count[0];
+    res[3 * i + 2] = count[1];
+  }
+  Py_END_ALLOW_THREADS
+
+done:
+  PyMem_Free(a);
+  PyMem_Free(b);
+  return out;
+}
+
+/* Shared state for the round robin workers. */
+typedef struct
+{
+  duel_fn duel;
+  PacGene *genes;
+  npy_intp n;
+  int *res; /* (n, n, 3) */
+  int *pts; /* (n, n) */
+} round_robin_job;
+
+/* Rows are dealt out round-robin, so every thread gets a mix of long
+   (early) and short (late) rows of the upper triangle. */
+static void round_robin_work(void *arg, int t, int nthreads)
+{
+  round_robin_job *job = (round_robin_job *)arg;
+  npy_intp n = job->n, i, j;
+
+  for (i = t; i < n; i += nthreads)
+  {
+    for (j = i + 1; j < n; j++)
+    {
+      int numrounds = 500, count[2], s1, s2;
+      int *ij = job->res + 3 * (i * n + j), *ji = job->res + 3 * (j * n + i);
+
+      job->duel(&job->genes[i], &job->genes[j], &numrounds, &count[0],
+                &count[1]);
+      score_duel(numrounds, count[0], count[1], &s1, &s2);
+      ij[0] = ji[0] = numrounds;
+      ij[1] = ji[2] = count[0];
+      ij[2] = ji[1] = count[1];
+      job->pts[i * n + j] = s1;
+      job->pts[j * n + i] = s2;
+    }
+  }
+}
+
+static PyObject *round_robin_PyPacwar(PyObject *self, PyObject *args,
+                                      PyObject *kwds)
+{
+  static char *kwlist[] = {"genes", "threads", NULL};
+  PyObject *g_obj, *res_array = NULL, *pts_array = NULL;
+  round_robin_job job;
+  npy_intp dims[3];
+  int threads = 0;
+
+  /* Parse the input tuple */
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|i", kwlist, &g_obj,
+                                   &threads))
+    return NULL;
+
+  /* Interpret the input object as an (N, 50) matrix. */
+  job.genes = genes_from_object(g_obj, &job.n);
+  if (job.genes == NULL)
+    return NULL;
+  if (job.n < 0)
+  {
+    PyErr_SetString(PyExc_ValueError, "genes must be an (N, 50) matrix");
+    goto done;
+  }
+  job.duel = engine;
+
+  dims[0] = dims[1] = job.n;
+  dims[2] = 3;
+  res_array = PyArray_ZEROS(3, dims, NPY_INT, 0);
+  pts_array = PyArray_ZEROS(2, dims, NPY_INT, 0);
+  if (res_array == NULL || pts_array == NULL)
+    goto done;
+  job.res = (int *)PyArray_DATA((PyArrayObject *)res_array);
+  job.pts = (int *)PyArray_DATA((PyArrayObject *)pts_array);
+
+  if (threads <= 0)
+    threads = cpu_count();
+  if (threads > job.n / 2)
+    threads = job.n / 2 > 0 ? (int)(job.n / 2) : 1;
+
+  Py_BEGIN_ALLOW_THREADS
+  run_parallel(round_robin_work, &job, threads);
+  Py_END_ALLOW_THREADS
+
+done:
+  PyMem_Free(job.genes);
+  if (PyErr_Occurred())
+  {
+    Py_XDECREF(res_array);
+    Py_XDECREF(pts_array);
+    return NULL;
+  }
+  return Py_BuildValue("NN", res_array, pts_array);
+}
+
+/* Points for one duel from the first gene's side, matching
+   myGene.duel_points (which differs from score.score when the duel is
+   cut short or both species die out). */
+static int gene_points(int rounds, int c_me, int c_opp)
+{
+  int bucket = rounds < 100 ? 0 : rounds < 200 ? 1 : rounds < 300 ? 2 : 3;
+  double ratio;
+
+  if (c_opp == 0 && c_me > 0)
+    return 20 - bucket;
+  if (c_me == 0 && c_opp > 0)
+    return bucket;
+  if (c_opp == 0)
+    return 13;
+  if (c_me == 0)
+    return 7;
+  ratio = (double)c_me / c_opp;
+  if (ratio >= 10.0)
+    return 13;
+  if (ratio >= 3.0)
+    return 12;
+  if (ratio >= 1.5)
+    return 11;
+  if (ratio <= 1.0 / 10.0)
+    return 7;
+  if (ratio <= 1.0 / 3.0)
+    return 8;
+  if (ratio <= 1.0 / 1.5)
+    return 9;
+  return 10;
+}
+
+#define NUM_NEIGHBORS 150
+
+/* Shared state for the neighborhood workers. */
+typedef struct
+{
+  duel_fn duel;
+  PacGene base;
+  PacGene *opps;
+  npy_intp m;
+  int *res;        /* (150, m, 3) */
+  double *scores;  /* (150,) */
+  int use_threshold;
+  long long threshold; /* in units of 0.01 points, summed over opponents */
+  volatile int *first; /* per thread: first neighbor above threshold */
+} neighborhood_job;
+
+static void neighborhood_work(void *arg, int t, int nthreads)
+{
+  neighborhood_job *job = (neighborhood_job *)arg;
+  npy_intp j;
+  int k, u, skip;
+
+  for (k = t; k < NUM_NEIGHBORS; k += nthreads)
+  {
+    PacGene g = job->base;
+    signed char *gs = (signed char *)&g;
+    int locus = k / 3, allele = k % 3;
+    long long total = 0;
+
+    /* Once any thread found an improvement, only earlier neighbors can
+       still change the answer.  Reading the other threads' slots without
+       a lock is fine: a stale value only means extra work. */
+    if (job->use_threshold)
+    {
+      skip = 0;
+      for (u = 0; u < nthreads; u++)
+        if (job->first[u] >= 0 && job->first[u] < k)
+          skip = 1;
+      if (skip)
+        break;
+    }
+
+    gs[locus] = (signed char)(allele >= gs[locus] ? allele + 1 : allele);
+    for (j = 0; j < job->m; j++)
+    {
+      int numrounds = 500, count[2];
+      int *r = job->res + 3 * (k * job->m + j);
+
+      job->duel(&g, &job->opps[j], &numrounds, &count[0], &count[1]);
+      r[0] = numrounds;
+      r[1] = count[0];
+      r[2] = count[1];
+      total += 100 * gene_points(numrounds, count[0], count[1]) +
+               (count[0] - count[1]);
+    }
+    job->scores[k] = job->m ? total / (100.0 * job->m) : 0.0;
+    if (job->use_threshold && total > job->threshold)
+    {
+      job->first[t] = k;
+      break;
+    }
+  }
+}
+
+static PyObject *neighborhood_PyPacwar(PyObject *self, PyObject *args,
+                                       PyObject *kwds)
+{
+  static char *kwlist[] = {"gene", "opponents", "threshold", "threads",
+                           NULL};
+  PyObject *g_obj, *o_obj, *thr_obj = Py_None;
+  PyObject *scores_array = NULL, *res_array = NULL;
+  neighborhood_job job;
+  npy_intp i, dims[3];
+  int threads = 0;
+  double threshold = 0.0, *scores;
+
+  /* Parse the input tuple */
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|Oi", kwlist, &g_obj,
+                                   &o_obj, &thr_obj, &threads))
+    return NULL;
+  job.use_threshold = thr_obj != Py_None;
+  if (job.use_threshold)
+  {
+    threshold = PyFloat_AsDouble(thr_obj);
+    if (threshold == -1.0 && PyErr_Occurred())
+      return NULL;
+  }
+
+  job.first = NULL;
+  job.opps = NULL;
+  if (!single_gene(g_obj, &job.base))
+    return NULL;
+  job.opps = genes_from_object(o_obj, &job.m);
+  if (job.opps == NULL)
+    return NULL;
+  if (job.m < 0)
+  {
+    PyErr_SetString(PyExc_ValueError, "opponents must be an (M, 50) matrix");
+    goto cleanup;
+  }
+  job.duel = engine;
+  job.first = (volatile int *)PyMem_Malloc(NUM_NEIGHBORS * sizeof(int));
+  if (job.first == NULL)
+  {
+    PyErr_NoMemory();
+    goto cleanup;
+  }
+  for (i = 0; i < NUM_NEIGHBORS; i++)
+    job.first[i] = -1;
+  /* Totals are whole hundredths, compared against floor(threshold * 100
+     * m + 1e-6): the tolerance keeps a threshold that is itself a mean of
+     hundredths, stored a hair below its true value, from letting a
+     neighbor that only ties it through. */
+  threshold = threshold * 100.0 * job.m + 1e-6;
+  if (threshold < -1e15)
+    threshold = -1e15;
+  if (threshold > 1e15)
+    threshold = 1e15;
+  job.threshold = job.use_threshold ? (long long)floor(threshold) : 0;
+
+  dims[0] = NUM_NEIGHBORS;
+  dims[1] = job.m;
+  dims[2] = 3;
+  scores_array = PyArray_SimpleNew(1, dims, NPY_DOUBLE);
+  res_array = PyArray_ZEROS(3, dims, NPY_INT, 0);
+  if (scores_array == NULL || res_array == NULL)
+    goto cleanup;
+  scores = (double *)PyArray_DATA((PyArrayObject *)scores_array);
+  for (i = 0; i < NUM_NEIGHBORS; i++)
+    scores[i] = Py_NAN;
+  job.scores = scores;
+  job.res = (int *)PyArray_DATA((PyArrayObject *)res_array);
+
+  if (threads <= 0)
+    threads = cpu_count();
+  if (threads > NUM_NEIGHBORS)
+    threads = NUM_NEIGHBORS;
+
+  Py_BEGIN_ALLOW_THREADS
+  run_parallel(neighborhood_work, &job, threads);
+  Py_END_ALLOW_THREADS
+
+  /* With several threads, neighbors past the first improvement may have
+     been finished before it was found; hide them so the result does not
+     depend on the thread count. */
+  if (job.use_threshold)
+  {
+    int first = NUM_NEIGHBORS;
+
+    for (i = 0; i < threads; i++)
+      if (job.first[i] >= 0 && job.first[i] < first)
+        first = job.first[i];
+    for (i = first + 1; i < NUM_NEIGHBORS; i++)
+    {
+      scores[i] = Py_NAN;
+      memset(job.res + 3 * i * job.m, 0, 3 * job.m * sizeof(int));
+    }
+  }
+
+cleanup:
+  PyMem_Free(job.opps);
+  PyMem_Free((void *)job.first);
+  if (PyErr_Occurred())
+  {
+    Py_XDECREF(scores_array);
+    Py_XDECREF(res_array);
+    return NULL;
+  }
+  return Py_BuildValue("NN", scores_array, res_array);
+}
+
+static PyObject *set_engine_PyPacwar(PyObject *self, PyObject *args)
+{
+  const char *name;
+  size_t i;
+
+  if (!PyArg_ParseTuple(args, "s", &name))
+    return NULL;
+  for (i = 0; i < sizeof(engines) / sizeof(engines[0]); i++)
+  {
+    if (strcmp(name, engines[i].name) == 0)
+    {
+      engine = engines[i].fn;
+      Py_RETURN_NONE;
+    }
+  }
+  PyErr_Format(PyExc_ValueError, "unknown engine '%s'", name);
+  return NULL;
+}
+
+static PyObject *get_engine_PyPacwar(PyObject *self, PyObject *unused)
+{
+  size_t i;
+
+  for (i = 0; i < sizeof(engines) / sizeof(engines[0]); i++)
+    if (engine == engines[i].fn)
+      return PyUnicode_FromString(engines[i].name);
+  Py_RETURN_NONE;
+}
+
+static PyObject *set_cycle_detection_PyPacwar(PyObject *self, PyObject *args)
+{
+  int on;
+
+  if (!PyArg_ParseTuple(args, "p", &on))
+    return NULL;
+  DetectCycles = on;
+  Py_RETURN_NONE;
+}
+
+static PyObject *get_cycle_detection_PyPacwar(PyObject *self,
+                                              PyObject *unused)
+{
+  return PyBool_FromLong(DetectCycles);
+}
+
+static PyObject *set_collect_stats_PyPacwar(PyObject *self, PyObject *args)
+{
+  int on;
+
+  if (!PyArg_ParseTuple(args, "p", &on))
+    return NULL;
+  CollectStats = on;
+  Py_RETURN_NONE;
+}
+
+static PyObject *get_collect_stats_PyPacwar(PyObject *self, PyObject *unused)
+{
+  return PyBool_FromLong(CollectStats);
+}
+
+static PyObject *stats_PyPacwar(PyObject *self, PyObject *unused)
+{
+  PacStats s;
+
+  GetStats(&s);
+  return Py_BuildValue(
+      "{sLsLsLsLsLsLsLsLsL}", "duels", s.duels, "rounds", s.rounds, "cells",
+      s.cells, "births", s.births, "conversions", s.conversions, "blowaways",
+      s.blowaways, "old_age_deaths", s.old_age_deaths, "cycle_exits",
+      s.cycle_exits, "rounds_skipped", s.rounds_skipped);
+}
+
+static PyObject *reset_stats_PyPacwar(PyObject *self, PyObject *unused)
+{
+  ResetStats();
+  Py_RETURN_NONE;
+}
+
+static PyObject *battle_loci_PyPacwar(PyObject *self, PyObject *args)
+{
+  PyObject *g1_obj, *g2_obj;
+  PacGene g[2];
+  int numrounds = 500, count[2];
+  unsigned long long used[2];
 
   /* Parse the input tuple */
   if (!PyArg_ParseTuple(args, "OO", &g1_obj, &g2_obj))
     return NULL;
 
-  /* Interpret the input objects as numpy arrays. */
-  g1_array = PyArray_FROM_OTF(g1_obj, NPY_INT, NPY_IN_ARRAY);
-  g2_array = PyArray_FROM_OTF(g2_obj, NPY_INT, NPY_IN_ARRAY);
+  if (!single_gene(g1_obj, &g[0]) || !single_gene(g2_obj, &g[1]))
+    return NULL;
+
+  Py_BEGIN_ALLOW_THREADS
+  TraceDuel(&g[0], &g[1], &numrounds, &count[0], &count[1], &used[0],
+            &used[1]);
+  Py_END_ALLOW_THREADS
+
+  return Py_BuildValue("iiiKK", numrounds, count[0], count[1], used[0],
+                       used[1]);
+}
+
+static PyObject *battle_many_loci_PyPacwar(PyObject *self, PyObject *args,
+                                           PyObject *kwds)
+{
+  static char *kwlist[] = {"genes_a", "genes_b", "rounds", NULL};
+  PyObject *a_obj, *b_obj, *res_array = NULL, *used_array = NULL;
+  PacGene *a, *b = NULL;
+  npy_intp n, na, nb, i, dims[2];
+  int *res;
+  npy_uint64 *used;
+  int maxrounds = 500;
+
+  /* Parse the input tuple */
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|i", kwlist, &a_obj,
+                                   &b_obj, &maxrounds))
+    return NULL;
+  if (maxrounds < 1)
+  {
+    PyErr_SetString(PyExc_ValueError, "rounds must be positive");
+    return NULL;
+  }
+
+  a = genes_from_object(a_obj, &na);
+  if (a == NULL)
+    return NULL;
+  b = genes_from_object(b_obj, &nb);
+  if (b == NULL)
+    goto done;
+  if (na >= 0 && nb >= 0 && na != nb)
+  {
+    PyErr_SetString(PyExc_ValueError,
+                    "gene matrices must have the same number of rows");
+    goto done;
+  }
+  n = na >= 0 ? na : (nb >= 0 ? nb : 1);
+
+  dims[0] = n;
+  dims[1] = 3;
+  res_array = PyArray_SimpleNew(2, dims, NPY_INT);
+  dims[1] = 2;
+  used_array = PyArray_SimpleNew(2, dims, NPY_UINT64);
+  if (res_array == NULL || used_array == NULL)
+    goto done;
+  res = (int *)PyArray_DATA((PyArrayObject *)res_array);
+  used = (npy_uint64 *)PyArray_DATA((PyArrayObject *)used_array);
 
-  /* If that didn't work, throw an exception. */
-  if (g1_array == NULL || g2_array == NULL)
+  Py_BEGIN_ALLOW_THREADS
+  for (i = 0; i < n; i++)
   {
-    Py_XDECREF(g1_array);
-    Py_XDECREF(g2_array);
+    int numrounds = maxrounds, count[2];
+    unsigned long long u[2];
+
+    TraceDuel(&a[na >= 0 ? i : 0], &b[nb >= 0 ? i : 0], &numrounds,
+              &count[0], &count[1], &u[0], &u[1]);
+    res[3 * i] = numrounds;
+    res[3 * i + 1] = count[0];
+    res[3 * i + 2] = count[1];
+    used[2 * i] = u[0];
+    used[2 * i + 1] = u[1];
+  }
+  Py_END_ALLOW_THREADS
+
+done:
+  PyMem_Free(a);
+  PyMem_Free(b);
+  if (PyErr_Occurred())
+  {
+    Py_XDECREF(res_array);
+    Py_XDECREF(used_array);
     return NULL;
   }
+  return Py_BuildValue("NN", res_array, used_array);
+}
+
+#define SNAP_CELLS ((MaxX - 2) * (MaxY - 2))
+
+static PyObject *battle_trace_PyPacwar(PyObject *self, PyObject *args,
+                                       PyObject *kwds)
+{
+  static char *kwlist[] = {"g1", "g2", "rounds", "snapshots", NULL};
+  PyObject *g1_obj, *g2_obj;
+  PyObject *counts_array = NULL, *snaps_array = NULL;
+  PacGene g[2];
+  int maxrounds = 500, snapshots = 0, numrounds;
+  int(*counts)[2];
+  unsigned char *snaps = NULL;
+  npy_intp dims[3];
 
-  /* How many data points are there? */
-  //int N = 50;
+  /* Parse the input tuple */
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|ip", kwlist, &g1_obj,
+                                   &g2_obj, &maxrounds, &snapshots))
+    return NULL;
+  if (maxrounds < 1)
+  {
+    PyErr_SetString(PyExc_ValueError, "rounds must be positive");
+    return NULL;
+  }
 
-  /* Get pointers to the data as C-types. */
-  g1 = (int *)PyArray_DATA(g1_array);
-  g2 = (int *)PyArray_DATA(g2_array);
+  if (!single_gene(g1_obj, &g[0]) || !single_gene(g2_obj, &g[1]))
+    return NULL;
 
-  /* Do battle. */
-  for (i = 0; i < 50; i++)
+  /* Record into C buffers sized for the cap, then copy out the rounds
+     actually played. */
+  counts = PyMem_Malloc(maxrounds * sizeof(*counts));
+  if (snapshots)
+    snaps = PyMem_Malloc((size_t)maxrounds * SNAP_CELLS);
+  if (counts == NULL || (snapshots && snaps == NULL))
   {
-    g1_str[i] = g1[i] + '0';
-    g2_str[i] = g2[i] + '0';
+    PyErr_NoMemory();
+    goto done;
   }
-  g1_str[i] = 0;
-  g2_str[i] = 0;
-  SetGeneFromString(g1_str, gp[0]);
-  SetGeneFromString(g2_str, gp[1]);
-  FastDuel(gp[0], gp[1], &numrounds, &count[0], &count[1]);
 
-  /* Clean up. */
-  Py_DECREF(g1_array);
-  Py_DECREF(g2_array);
+  numrounds = maxrounds;
+  Py_BEGIN_ALLOW_THREADS
+  TrajectoryDuel(&g[0], &g[1], &numrounds, counts, snaps);
+  Py_END_ALLOW_THREADS
 
-  /* Build the output tuple */
-  ret = Py_BuildValue("iii", numrounds, count[0], count[1]);
-  return ret;
+  dims[0] = numrounds;
+  dims[1] = 2;
+  counts_array = PyArray_SimpleNew(2, dims, NPY_INT);
+  if (counts_array == NULL)
+    goto done;
+  memcpy(PyArray_DATA((PyArrayObject *)counts_array), counts,
+         numrounds * sizeof(*counts));
+  if (snapshots)
+  {
+    dims[1] = MaxX - 2;
+    dims[2] = MaxY - 2;
+    snaps_array = PyArray_SimpleNew(3, dims, NPY_UINT8);
+    if (snaps_array == NULL)
+      goto done;
+    memcpy(PyArray_DATA((PyArrayObject *)snaps_array), snaps,
+           (size_t)numrounds * SNAP_CELLS);
+  }
+
+done:
+  PyMem_Free(counts);
+  PyMem_Free(snaps);
+  if (PyErr_Occurred())
+  {
+    Py_XDECREF(counts_array);
+    Py_XDECREF(snaps_array);
+    return NULL;
+  }
+  if (snapshots)
+    return Py_BuildValue("NN", counts_array, snaps_array);
+  return counts_array;
 }
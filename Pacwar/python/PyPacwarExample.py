@@ -2,6 +2,7 @@ import random
 from typing import Callable
 import _PyPacwar
 import numpy
+from myGene import SurrogateEvaluator, score_once_array
 
 ones = [1] * 50
 threes = [1] * 50
@@ -24,43 +25,77 @@ def str_to_seq(string: str) -> list[gene]:
     return list(map(int, list(string)))
 
 
-def iterate_single(*, max_winners: int, stop_probability: float, mutation_count: Callable[[], float]) -> sequence:
+def iterate_single(*, max_winners: int, stop_probability: float, mutation_count: Callable[[], float],
+                   surrogate: SurrogateEvaluator | None = None) -> sequence:
+    # surrogate: skip neighbors it predicts lose to some winner (score_once
+    # of at most 10 against it) without playing them; it learns from every
+    # gauntlet duel that is played.
     curr = ones.copy()
 
     # You have to beat all of the winners for the hill-climb to take it.
     winners = [curr, threes]
+    # How often each winner was played and how often it rejected the
+    # neighbor, kept in step with winners.
+    tries = [0, 0]
+    kills = [0, 0]
 
     i = 0
     wins = 0
+    duels = 0
     print_every = 100
     while True:
         i += 1
         if i % print_every == 0:
-            print(f"Iteration {i}, {wins}/{print_every}")
+            print(f"Iteration {i}, {wins}/{print_every}, {duels / print_every:.1f} duels/neighbor")
             print(seq_to_str(curr))
+            if surrogate is not None:
+                print(surrogate.stats())
 
             if wins == 0 and random.random() < stop_probability:
                 break
             
             wins = 0
+            duels = 0
 
         neighbor = mutate(curr, n=mutation_count())
+        if surrogate is not None:
+            warm = surrogate.observed >= surrogate.warmup
+            predicted = float(surrogate.predict(neighbor, winners).min())
+            promote, audit = surrogate.screen(predicted, 10.0)
+            if not (promote or audit):
+                continue
+        played, points = [], []
         won_all = True
-        for winner in winners:
-            (_rounds, c1, c2) = _PyPacwar.battle(winner, neighbor)
+        # Play the most lethal winners first; one loss is enough to reject.
+        gauntlet = sorted(range(len(winners)), key=lambda k: -(kills[k] + 1) / (tries[k] + 2))
+        for k in gauntlet:
+            (rounds, c1, c2) = _PyPacwar.battle(winners[k], neighbor)
+            duels += 1
+            played.append(winners[k])
+            points.append(score_once_array([rounds, c2, c1])[0, 0])
+            tries[k] += 1
             # If the past winner beats this, we don't want it.
             if c1 >= c2:
+                kills[k] += 1
                 won_all = False
+                break
+        if surrogate is not None:
+            surrogate.observe(neighbor, played, points)
+            surrogate.record(promote, won_all, warm)
         
         if won_all:
             wins += 1
             curr = neighbor
             winners.append(neighbor)
+            tries.append(0)
+            kills.append(0)
             
             # Remove a random one maybe.
             if random.uniform(0, 1) < len(winners) / max_winners:
                 idx_to_remove = random.randint(0, len(winners) - 2)
                 winners.pop(idx_to_remove)
+                tries.pop(idx_to_remove)
+                kills.pop(idx_to_remove)
 
     return i, winners
 
@@ -0,0 +1,203 @@
+"""
+Pure-NumPy Pacwar engine that plays a whole batch of duels in lockstep.
+
+Every duel in the batch is a (21, 11) world held in (B, 21, 11) arrays for
+kind, dir and age, and one round of ComputeNewWorld (PacWarGuts.c) is a
+fixed sequence of vectorized neighbor shifts and per-duel gene gathers.
+Duels that finish (a species wiped out) are retired from the batch.
+
+It needs nothing but NumPy, so it runs where _PyPacwar cannot be rebuilt,
+and it doubles as an independent oracle for the C engines (see bench.py).
+"""
+import numpy as np
+
+SPECIES1, SPECIES2, BLOB, BARRIER = 0, 1, 2, 3
+MAX_X, MAX_Y = 21, 11
+
+# The x and y components of the directions, and their opposites
+DX = (1, 0, -1, 0)
+DY = (0, -1, 0, 1)
+OPDIR = np.array([2, 3, 0, 1], dtype=np.int8)
+
+# Offsets of the gene tables within the 50 loci
+U, V, W, X, Y, Z = 0, 4, 20, 23, 26, 38
+
+
+def _as_genes(genes) -> np.ndarray:
+    genes = np.asarray(genes, dtype=np.int64)
+    if genes.shape[-1] != 50 or genes.ndim not in (1, 2):
+        raise ValueError("genes must be (N, 50) matrices or single 50-long genes")
+    if genes.size and (genes.min() < 0 or genes.max() > 3):
+        raise ValueError("gene alleles must be in 0..3")
+    return genes
+
+
+def prep_duels(n: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build n starting worlds, like PrepDuel.
+
+    Returns:
+        (kind, dir, age) arrays of shape (n, 21, 11)
+    """
+    kind = np.full((n, MAX_X, MAX_Y), BLOB, dtype=np.int8)
+    kind[:, 0, :] = kind[:, -1, :] = kind[:, :, 0] = kind[:, :, -1] = BARRIER
+    dirs = np.zeros((n, MAX_X, MAX_Y), dtype=np.int8)
+    age = np.full((n, MAX_X, MAX_Y), -1, dtype=np.int8)
+    kind[:, 5, 5], dirs[:, 5, 5], age[:, 5, 5] = SPECIES1, 0, 0
+    kind[:, 15, 5], dirs[:, 15, 5], age[:, 15, 5] = SPECIES2, 2, 0
+    return kind, dirs, age
+
+
+def compute_new_worlds(kind, dirs, age, genes):
+    """
+    One round of ComputeNewWorld for every world in the batch.
+
+    Args:
+        kind, dirs, age: (B, 21, 11) int8 arrays for the current worlds
+        genes: (B, 2, 50) int8 array of the genes of both species of each duel
+
+    Returns:
+        The (kind, dir, age) arrays of the new worlds
+    """
+    b = kind.shape[0]
+    flat = genes.reshape(-1)
+    # Row of each duel's species-1 gene in the flattened gene array
+    row = (np.arange(b, dtype=np.intp) * 100).reshape(b, 1, 1)
+
+    spot_k = kind[:, 1:-1, 1:-1]
+    spot_d = dirs[:, 1:-1, 1:-1]
+    spot_a = age[:, 1:-1, 1:-1]
+    mite = spot_k <= SPECIES2
+
+    # Neighbor planes, indexed by the direction of the neighbor
+    nk = np.stack([kind[:, 1 + dx:MAX_X - 1 + dx, 1 + dy:MAX_Y - 1 + dy]
+                   for dx, dy in zip(DX, DY)])
+    nd = np.stack([dirs[:, 1 + dx:MAX_X - 1 + dx, 1 + dy:MAX_Y - 1 + dy]
+                   for dx, dy in zip(DX, DY)])
+    na = np.stack([age[:, 1 + dx:MAX_X - 1 + dx, 1 + dy:MAX_Y - 1 + dy]
+                   for dx, dy in zip(DX, DY)])
+
+    # Who's the strongest attacker, and how many are strongest?
+    attack = (nk <= SPECIES2) & (nd == OPDIR.reshape(4, 1, 1, 1))
+    best = np.where(attack, na, np.int8(-1)).max(axis=0)
+    top = attack & (na == best)
+    num_attack = top.sum(axis=0, dtype=np.int8)
+    top2 = top & (nk == SPECIES2)
+    enemy_in_top = np.where(spot_k == SPECIES1, top2.any(axis=0),
+                            (top & (nk == SPECIES1)).any(axis=0))
+
+    # Attributes of the unique strongest attacker (where there is one)
+    e_kind = top2.any(axis=0).astype(np.int8)
+    d_star = top[1] + 2 * top[2].astype(np.int8) + 3 * top[3].astype(np.int8)
+    e_dir = OPDIR[d_star & 3]
+
+    birth = (spot_k == BLOB) & (num_attack == 1)
+    blow = mite & enemy_in_top & (num_attack > 1)
+    conv = mite & enemy_in_top & (num_attack == 1)
+    old_age = mite & ~enemy_in_top & (spot_a == 3)
+    aging = mite & ~enemy_in_top & (spot_a < 3)
+    born = birth | conv
+
+    # What each mite is facing, and which turn entry that selects
+    d_idx = (spot_d & 3)[None].astype(np.intp)
+    f_kind = np.take_along_axis(nk, d_idx, axis=0)[0]
+    rel = (np.take_along_axis(nd, d_idx, axis=0)[0] - spot_d) & 3
+    age_c = np.maximum(spot_a, 0)
+    aged_off = np.where(
+        f_kind == BARRIER, W + age_c,
+        np.where(f_kind == BLOB, X + age_c,
+                 np.where(f_kind == spot_k, Y, Z) + 3 * rel + age_c),
+    )
+
+    # One gather gives the turn for every birth, conversion and aging mite:
+    # u/v of the attacker's gene or w/x/y/z of the mite's own gene.
+    best_c = np.maximum(best, 0)
+    conv_e = (spot_d - e_dir) & 3
+    born_off = np.where(birth, U + best_c, V + 4 * conv_e + best_c)
+    gene_s = np.where(born, e_kind, spot_k & 1).astype(np.intp)
+    off = np.where(born, born_off, np.where(aging, aged_off, 0))
+    turn = flat[row + 50 * gene_s + off]
+    base = np.where(born, e_dir, spot_d)
+
+    new_kind = kind.copy()
+    new_dirs = dirs.copy()
+    new_age = age.copy()
+    new_kind[:, 1:-1, 1:-1] = np.where(
+        born, e_kind, np.where(blow | old_age, np.int8(BLOB), spot_k))
+    new_dirs[:, 1:-1, 1:-1] = np.where(born | aging, (base + turn) & 3, spot_d)
+    new_age[:, 1:-1, 1:-1] = np.where(
+        born, np.int8(0),
+        np.where(aging, spot_a + 1, np.where(blow | old_age, np.int8(-1), spot_a)))
+    return new_kind, new_dirs, new_age
+
+
+def battle_many(genes_a, genes_b, rounds: int = 500) -> np.ndarray:
+    """
+    NumPy counterpart of _PyPacwar.battle_many.
+
+    Args:
+        genes_a, genes_b: (N, 50) gene matrices; either may be a single gene
+            that is battled against every row of the other
+        rounds: Round cap for every duel
+
+    Returns:
+        An (N, 3) int array of (rounds, count1, count2)
+    """
+    genes_a, genes_b = _as_genes(genes_a), _as_genes(genes_b)
+    if genes_a.ndim == 2 and genes_b.ndim == 2 and len(genes_a) != len(genes_b):
+        raise ValueError("gene matrices must have the same number of rows")
+    n = max(len(g) if g.ndim == 2 else 1 for g in (genes_a, genes_b))
+    genes = np.stack(
+        [np.broadcast_to(genes_a, (n, 50)), np.broadcast_to(genes_b, (n, 50))],
+        axis=1,
+    ).astype(np.int8)
+
+    out = np.zeros((n, 3), dtype=np.int32)
+    out[:, 1:] = 1
+    kind, dirs, age = prep_duels(n)
+    active = np.arange(n)
+    for round in range(1, rounds + 1):
+        if not len(active):
+            break
+        kind, dirs, age = compute_new_worlds(kind, dirs, age, genes)
+        interior = kind[:, 1:-1, 1:-1]
+        c1 = (interior == SPECIES1).sum(axis=(1, 2))
+        c2 = (interior == SPECIES2).sum(axis=(1, 2))
+        out[active] = np.stack([np.full_like(c1, round), c1, c2], axis=1)
+
+        # Retire the duels that just ended
+        alive = (c1 > 0) & (c2 > 0)
+        if not alive.all():
+            active = active[alive]
+            kind, dirs, age, genes = kind[alive], dirs[alive], age[alive], genes[alive]
+    return out
+
+
+def unpack_snapshots(worlds: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Unpack the worlds from _PyPacwar.battle_trace(..., snapshots=True).
+
+    Args:
+        worlds: (R, 19, 9) uint8 array of packed interiors
+
+    Returns:
+        (kind, dir, age) arrays of shape (R, 21, 11), laid out like
+        prep_duels (barriers around the edge, dir 0 on blobs)
+    """
+    worlds = np.asarray(worlds, dtype=np.uint8)
+    n = len(worlds)
+    kind = np.full((n, MAX_X, MAX_Y), BARRIER, dtype=np.int8)
+    dirs = np.zeros((n, MAX_X, MAX_Y), dtype=np.int8)
+    age = np.full((n, MAX_X, MAX_Y), -1, dtype=np.int8)
+    kind[:, 1:-1, 1:-1] = worlds & 3
+    dirs[:, 1:-1, 1:-1] = (worlds >> 2) & 3
+    age[:, 1:-1, 1:-1] = (worlds >> 4).astype(np.int8) - 1
+    return kind, dirs, age
+
+
+def battle(g1, g2, rounds: int = 500) -> tuple[int, int, int]:
+    """
+    NumPy counterpart of _PyPacwar.battle.
+    """
+    rounds, c1, c2 = battle_many(g1, g2, rounds=rounds)[0].tolist()
+    return rounds, c1, c2
@@ -0,0 +1,182 @@
+"""
+Cross-checks and throughput benchmarks for the _PyPacwar duel engines.
+
+Run with:
+    python bench.py
+"""
+import time
+import numpy as np
+import _PyPacwar
+import batchsim
+import myGene
+import score
+
+ENGINES = ("cell", "bitplane")
+
+
+def random_genes(n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draw n genes: half uniformly random, half biased towards 1s like the
+    defensive genes our searches converge to (those duels tend to last
+    the full 500 rounds).
+    """
+    uniform = rng.integers(0, 4, size=(n - n // 2, 50))
+    biased = rng.choice([0, 1, 1, 1, 1, 2, 3], size=(n // 2, 50))
+    return np.concatenate([uniform, biased])
+
+
+def check_engines(n: int = 5000, seed: int = 0) -> int:
+    """
+    Battle n random gene pairs on every engine, with and without cycle
+    detection.
+
+    Returns:
+        The number of pairs on which some configuration disagrees with the
+        full 'cell' simulation
+    """
+    rng = np.random.default_rng(seed)
+    genes_a, genes_b = random_genes(n, rng), random_genes(n, rng)
+    previous = _PyPacwar.get_engine(), _PyPacwar.get_cycle_detection()
+    try:
+        results = {}
+        for name in ENGINES:
+            for cycles in (False, True):
+                _PyPacwar.set_engine(name)
+                _PyPacwar.set_cycle_detection(cycles)
+                results[name, cycles] = _PyPacwar.battle_many(genes_a, genes_b)
+    finally:
+        _PyPacwar.set_engine(previous[0])
+        _PyPacwar.set_cycle_detection(previous[1])
+
+    mismatched = np.zeros(n, dtype=bool)
+    for result in results.values():
+        mismatched |= (result != results["cell", False]).any(axis=1)
+    return int(mismatched.sum())
+
+
+def check_batchsim(n: int = 500, seed: int = 2) -> int:
+    """
+    Battle n random gene pairs on the pure-NumPy engine in batchsim.
+
+    Returns:
+        The number of pairs on which it disagrees with the 'cell' engine
+    """
+    rng = np.random.default_rng(seed)
+    genes_a, genes_b = random_genes(n, rng), random_genes(n, rng)
+    previous = _PyPacwar.get_engine()
+    try:
+        _PyPacwar.set_engine("cell")
+        expected = _PyPacwar.battle_many(genes_a, genes_b)
+    finally:
+        _PyPacwar.set_engine(previous)
+    return int((batchsim.battle_many(genes_a, genes_b) != expected).any(axis=1).sum())
+
+
+def check_trace(n: int = 50, seed: int = 3) -> int:
+    """
+    Replay n random duels from _PyPacwar.battle_trace snapshots round by
+    round with batchsim.compute_new_worlds, and compare the counts with
+    battle() (cycle detection off, so nothing is skipped).
+
+    Returns:
+        The number of duels whose trace disagrees somewhere
+    """
+    rng = np.random.default_rng(seed)
+    genes_a, genes_b = random_genes(n, rng), random_genes(n, rng)
+    previous = _PyPacwar.get_cycle_detection()
+    _PyPacwar.set_cycle_detection(False)
+    try:
+        bad = 0
+        for g1, g2 in zip(genes_a, genes_b):
+            counts, worlds = _PyPacwar.battle_trace(g1, g2, snapshots=True)
+            rounds, c1, c2 = _PyPacwar.battle(g1.tolist(), g2.tolist())
+            ok = len(counts) == rounds and tuple(counts[-1]) == (c1, c2)
+
+            kind, dirs, age = batchsim.unpack_snapshots(worlds)
+            genes = np.stack([g1, g2]).astype(np.int8)[None]
+            world = batchsim.prep_duels(1)
+            for r in range(len(worlds)):
+                world = batchsim.compute_new_worlds(*world, genes)
+                mite = world[0][0] <= batchsim.SPECIES2
+                ok &= (world[0][0] == kind[r]).all()
+                ok &= (world[1][0][mite] == dirs[r][mite]).all()
+                ok &= (world[2][0][mite] == age[r][mite]).all()
+                ok &= (mite[1:-1, 1:-1].sum() == counts[r].sum())
+            bad += not ok
+    finally:
+        _PyPacwar.set_cycle_detection(previous)
+    return bad
+
+
+def check_scoring() -> int:
+    """
+    Compare the vectorized scorers (myGene.duel_points_array,
+    myGene.score_once_array, score.score_array) with the scalar ones on
+    every count pair 0..171 at each side of the 100-round boundaries and
+    at 500 rounds. That covers both-zero and one-zero counts and every
+    exact ratio threshold (e.g. 30:3, 3:1, 3:2).
+
+    Returns:
+        The number of result rows on which any scorer disagrees
+    """
+    counts = np.arange(172)
+    rounds = [1, 99, 100, 101, 199, 200, 201, 299, 300, 301, 499, 500]
+    r, c1, c2 = np.meshgrid(rounds, counts, counts, indexing="ij")
+    results = np.stack([r.ravel(), c1.ravel(), c2.ravel()], axis=1)
+
+    expected_points, expected_once, expected_score = [], [], []
+    for rnd, a, b in results.tolist():
+        expected_points.append((myGene.duel_points(rnd, a, b), myGene.duel_points(rnd, b, a)))
+        expected_once.append((
+            myGene.duel_points(rnd, a, b) + 1e-2 * (a - b),
+            myGene.duel_points(rnd, b, a) + 1e-2 * (b - a),
+        ))
+        expected_score.append(score.score(rnd, a, b))
+
+    mismatched = (myGene.duel_points_array(results) != expected_points).any(axis=1)
+    mismatched |= (myGene.score_once_array(results) != expected_once).any(axis=1)
+    mismatched |= (score.score_array(results) != expected_score).any(axis=1)
+    return int(mismatched.sum())
+
+
+def bench_engines(n: int = 2000, seed: int = 1) -> dict[str, float]:
+    """
+    Time battle_many over n random gene pairs on every engine.
+
+    Returns:
+        A dict mapping engine name to duels per second ('numpy' is the
+        batchsim engine)
+    """
+    rng = np.random.default_rng(seed)
+    genes_a, genes_b = random_genes(n, rng), random_genes(n, rng)
+    previous = _PyPacwar.get_engine()
+    rates = {}
+    try:
+        for name in ENGINES:
+            _PyPacwar.set_engine(name)
+            start = time.perf_counter()
+            _PyPacwar.battle_many(genes_a, genes_b)
+            rates[name] = n / (time.perf_counter() - start)
+    finally:
+        _PyPacwar.set_engine(previous)
+
+    start = time.perf_counter()
+    batchsim.battle_many(genes_a, genes_b)
+    rates["numpy"] = n / (time.perf_counter() - start)
+    return rates
+
+
+def main():
+    mismatches = check_engines()
+    print(f"engine mismatches: {mismatches}")
+    print(f"batchsim mismatches: {check_batchsim()}")
+    print(f"trace mismatches: {check_trace()}")
+    print(f"scoring mismatches: {check_scoring()}")
+
+    rates = bench_engines()
+    for name, rate in rates.items():
+        print(f"{name:>10}: {rate:10.0f} duels/s ({rate / rates['cell']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Duel result cache keyed by gene pair.
+
+Duels are deterministic, so a (rounds, c1, c2) result never goes stale.
+DuelCache keeps recent results in a bounded in-process LRU and every
+result in an on-disk SQLite store, so later runs (and other scripts)
+reuse what earlier ones simulated. Keys pack each gene to 2 bits per
+allele, 13 bytes per gene.
+
+DuelCache.battle / battle_many have the same signatures as the
+_PyPacwar functions, so a cache can be passed wherever the searches take
+a duel backend:
+
+    cache = duelcache.default_cache()
+    myGene.evaluate(me, opponents, cache=cache)
+    print(cache.stats())
+
+Only standard 500-round duels are cached. New results reach the disk in
+batches (every commit_every inserts, on flush() and on close()); the
+default cache flushes when the interpreter exits.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import _PyPacwar
+from gene import as_array
+
+DEFAULT_PATH = os.environ.get(
+    "PACWAR_DUEL_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "pacwar", "duels.sqlite3"),
+)
+
+# SQLite's default limit on host parameters per statement is 999
+_SQL_CHUNK = 900
+
+
+def pack_genes(genes) -> np.ndarray:
+    """
+    Pack genes to 2 bits per allele.
+
+    Args:
+        genes: A (N, 50) matrix or a single 50-long gene
+
+    Returns:
+        A (N, 13) uint8 array (a single gene gives N = 1)
+    """
+    genes = as_array(genes).reshape(-1, 50)
+    padded = np.zeros((len(genes), 52), dtype=np.uint8)
+    padded[:, :50] = genes
+    return (padded[:, 0::4] << 6) | (padded[:, 1::4] << 4) | (padded[:, 2::4] << 2) | padded[:, 3::4]
+
+
+def pair_keys(genes_a, genes_b) -> list[bytes]:
+    """
+    Cache keys for the pairs (genes_a[i], genes_b[i]); either side may be a
+    single gene, as in _PyPacwar.battle_many.
+    """
+    a, b = pack_genes(genes_a), pack_genes(genes_b)
+    a, b = np.broadcast_arrays(a, b)
+    return [row.tobytes() for row in np.concatenate([a, b], axis=1)]
+
+
+class DuelCache:
+    """
+    In-process LRU in front of an on-disk SQLite store of duel results.
+
+    Args:
+        path: SQLite file to use (created if missing), or None for a purely
+            in-memory cache
+        max_entries: Bound on the number of results kept in the LRU
+        commit_every: Inserts to collect before committing them to disk
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_PATH, max_entries: int = 200_000,
+                 commit_every: int = 10_000):
+        self.max_entries = max_entries
+        self.commit_every = commit_every
+        self._pending = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru: OrderedDict[bytes, tuple[int, int, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            # a lost tail of results only costs replaying those duels
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS duels ("
+                "key BLOB PRIMARY KEY, rounds INTEGER, c1 INTEGER, c2 INTEGER"
+                ") WITHOUT ROWID"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _remember(self, key: bytes, result: tuple[int, int, int]):
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: list[bytes]) -> list[Optional[tuple[int, int, int]]]:
+        """
+        Bulk lookup. Returns the cached result for each key, or None.
+        """
+        found: list[Optional[tuple[int, int, int]]] = [None] * len(keys)
+        with self._lock:
+            missing = {}
+            for i, key in enumerate(keys):
+                result = self._lru.get(key)
+                if result is not None:
+                    self._lru.move_to_end(key)
+                    found[i] = result
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            if self._db is not None and missing:
+                wanted = list(missing)
+                for start in range(0, len(wanted), _SQL_CHUNK):
+                    chunk = wanted[start:start + _SQL_CHUNK]
+                    rows = self._db.execute(
+                        "SELECT key, rounds, c1, c2 FROM duels WHERE key IN (%s)"
+                        % ",".join("?" * len(chunk)),
+                        chunk,
+                    )
+                    for key, rounds, c1, c2 in rows:
+                        result = (rounds, c1, c2)
+                        self._remember(key, result)
+                        for i in missing.pop(key):
+                            found[i] = result
+                            self.disk_hits += 1
+
+            self.misses += sum(len(idx) for idx in missing.values())
+        return found
+
+    def put_many(self, keys: list[bytes], results) -> None:
+        """
+        Bulk insert of (rounds, c1, c2) results.
+        """
+        rows = [(key, *map(int, result)) for key, result in zip(keys, results)]
+        with self._lock:
+            for key, rounds, c1, c2 in rows:
+                self._remember(key, (rounds, c1, c2))
+            if self._db is not None and rows:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO duels (key, rounds, c1, c2) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._pending += len(rows)
+                if self._pending >= self.commit_every:
+                    self._db.commit()
+                    self._pending = 0
+    def battle_many(self, genes_a, genes_b, rounds: int = 500) -> np.ndarray:
+        """
+        Cached _PyPacwar.battle_many: only pairs never seen before are played.
+        Duels capped below 500 rounds are passed straight through.
+        """
+        if rounds != 500:
+            return _PyPacwar.battle_many(genes_a, genes_b, rounds=rounds)
+        keys = pair_keys(genes_a, genes_b)
+        found = self.get_many(keys)
+        out = np.zeros((len(keys), 3), dtype=np.int32)
+        todo = []
+        for i, result in enumerate(found):
+            if result is None:
+                todo.append(i)
+            else:
+                out[i] = result
+
+        if todo:
+            a = np.broadcast_to(as_array(genes_a).reshape(-1, 50), (len(keys), 50))
+            b = np.broadcast_to(as_array(genes_b).reshape(-1, 50), (len(keys), 50))
+            played = _PyPacwar.battle_many(a[todo], b[todo])
+            out[todo] = played
+            self.put_many([keys[i] for i in todo], played.tolist())
+        return out
+
+    def battle(self, g1, g2, rounds: int = 500) -> tuple[int, int, int]:
+        """
+        Cached _PyPacwar.battle.
+        """
+        rounds, c1, c2 = self.battle_many(g1, g2, rounds=rounds)[0].tolist()
+        return rounds, c1, c2
+
+    def stats(self) -> dict:
+        """
+        Hit and miss counters, for sizing the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._lru),
+                "max_entries": self.max_entries,
+            }
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM duels").fetchone()[0]
+        return stats
+
+    def flush(self) -> None:
+        """
+        Commit the results inserted since the last commit.
+        """
+        with self._lock:
+            if self._db is not None and self._pending:
+                self._db.commit()
+                self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_cache: Optional[DuelCache] = None
+
+
+def default_cache() -> DuelCache:
+    """
+    The process-wide cache on DEFAULT_PATH (set PACWAR_DUEL_CACHE to move it).
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DuelCache()
+        atexit.register(_default_cache.close)
+    return _default_cache
@@ -0,0 +1,420 @@
+"""
+Local duel server shared by several search scripts.
+
+One process owns the engine and a DuelCache; clients send gene pairs over a
+Unix socket (or localhost TCP) and get (rounds, c1, c2) rows back. The
+server coalesces pairs from all clients into large battle_many batches, so
+concurrent scripts keep the engine busy instead of each paying its own
+per-call overhead, and repeats from any client come out of the one cache.
+
+    python duelserver.py --engine bitplane &
+
+    client = DuelClient()
+    client.battle_many(genes_a, genes_b)      # same as _PyPacwar.battle_many
+    print(client.stats())
+
+    async with await AsyncDuelClient.connect() as client:
+        results = await asyncio.gather(*(client.battle(me, o) for o in opponents))
+
+Wire format: each frame is a header (op, request id, count, rounds)
+followed by the payload. A battle request carries count * 100 bytes (gene a
+then gene b, one byte per allele); its reply carries count * 3 int32s. Stats
+replies (JSON) and errors carry count bytes. Replies may come back out of
+order; the request id pairs them up.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+import _PyPacwar
+import duelcache
+from gene import as_array
+
+DEFAULT_ADDRESS = os.environ.get("PACWAR_DUEL_SERVER", "/tmp/pacwar-duels.sock")
+
+_HEADER = struct.Struct("!BIIH")
+_OP_BATTLE, _OP_STATS, _OP_RESULT, _OP_ERROR = range(4)
+_PAIR_BYTES = 100
+_RESULT_DTYPE = np.dtype("<i4")
+
+
+def _parse_address(address: str):
+    """
+    "host:port" for TCP, anything else is a Unix socket path.
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def _check_rounds(rounds: int) -> None:
+    # the header carries the round cap as a uint16
+    if not 1 <= rounds <= 0xFFFF:
+        raise ValueError("rounds must be in 1..65535")
+
+
+def _request_error(pairs: np.ndarray, rounds: int) -> Optional[str]:
+    # checked per request, so one bad request cannot fail the batch it
+    # would have been merged into
+    if len(pairs) and pairs.max() > 3:
+        return "gene alleles must be in 0..3"
+    if rounds < 1:
+        return "rounds must be positive"
+    return None
+
+
+def _pairs_payload(genes_a, genes_b) -> tuple[int, bytes]:
+    a = as_array(genes_a).reshape(-1, 50)
+    b = as_array(genes_b).reshape(-1, 50)
+    if len(a) != len(b) and len(a) != 1 and len(b) != 1:
+        raise ValueError("gene matrices must have the same number of rows")
+    a, b = np.broadcast_arrays(a, b)
+    return len(a), np.concatenate([a, b], axis=1).tobytes()
+
+
+class _Batch:
+    def __init__(self):
+        self.parts: list[tuple[np.ndarray, asyncio.Future]] = []
+        self.pairs = 0
+
+
+class DuelServer:
+    """
+    Batching duel server.
+
+    Args:
+        cache: Shared result cache, or None to always simulate
+        max_batch: Play a batch as soon as it holds this many pairs
+        max_delay: Seconds to wait for more pairs before playing a batch
+    """
+
+    def __init__(self, cache: Optional[duelcache.DuelCache] = None, max_batch: int = 4096,
+                 max_delay: float = 0.002):
+        self.cache = cache
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._batches: dict[int, _Batch] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self._started = time.monotonic()
+        self._latencies: deque[float] = deque(maxlen=10_000)
+        self.clients = 0
+        self.requests = 0
+        self.pairs = 0
+        self.batches = 0
+        self.duplicates = 0
+        self.busy = 0.0
+
+    # Batching
+
+    def _submit(self, pairs: np.ndarray, rounds: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._batches.setdefault(rounds, _Batch())
+        batch.parts.append((pairs, future))
+        batch.pairs += len(pairs)
+        if batch.pairs >= self.max_batch:
+            self._flush(rounds)
+        elif rounds not in self._timers:
+            self._timers[rounds] = loop.call_later(self.max_delay, self._flush, rounds)
+        return future
+
+    def _flush(self, rounds: int):
+        timer = self._timers.pop(rounds, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._batches.pop(rounds, None)
+        if batch is not None and batch.parts:
+            asyncio.get_running_loop().create_task(self._play(batch, rounds))
+
+    def _battle_many(self, pairs: np.ndarray, rounds: int) -> tuple[np.ndarray, int, float]:
+        # runs on an executor thread, so it leaves the counters to _play
+        start = time.monotonic()
+        # a pair sent by several clients is looked up and played once
+        unique, inverse = np.unique(pairs, axis=0, return_inverse=True)
+        a = np.ascontiguousarray(unique[:, :50])
+        b = np.ascontiguousarray(unique[:, 50:])
+        if self.cache is not None:
+            results = self.cache.battle_many(a, b, rounds=rounds)
+        else:
+            results = _PyPacwar.battle_many(a, b, rounds=rounds)
+        results = np.asarray(results)[inverse.reshape(-1)]
+        return results, len(pairs) - len(unique), time.monotonic() - start
+
+    async def _play(self, batch: _Batch, rounds: int):
+        pairs = np.concatenate([part for part, _ in batch.parts])
+        self.batches += 1
+        try:
+            # _PyPacwar releases the GIL, so the loop keeps accepting requests
+            results, duplicates, busy = await asyncio.get_running_loop().run_in_executor(
+                None, self._battle_many, pairs, rounds)
+        except Exception as e:
+            for _, future in batch.parts:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.duplicates += duplicates
+        self.busy += busy
+        start = 0
+        for part, future in batch.parts:
+            if not future.done():
+                future.set_result(results[start:start + len(part)])
+            start += len(part)
+
+    # Connections
+
+    async def _answer(self, writer: asyncio.StreamWriter, lock: asyncio.Lock, request_id: int,
+                      pairs: np.ndarray, rounds: int):
+        start = time.monotonic()
+        try:
+            results = await self._submit(pairs, rounds)
+            op, payload, count = _OP_RESULT, results.astype(_RESULT_DTYPE).tobytes(), len(results)
+        except Exception as e:
+            payload = str(e).encode()
+            op, count = _OP_ERROR, len(payload)
+        self._latencies.append(time.monotonic() - start)
+        async with lock:
+            writer.write(_HEADER.pack(op, request_id, count, 0) + payload)
+            await writer.drain()
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients += 1
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                op, request_id, count, rounds = _HEADER.unpack(header)
+                if op == _OP_STATS:
+                    payload = json.dumps(self.stats()).encode()
+                    async with lock:
+                        writer.write(_HEADER.pack(_OP_STATS, request_id, len(payload), 0) + payload)
+                        await writer.drain()
+                    continue
+                if op != _OP_BATTLE:
+                    break
+                data = await reader.readexactly(count * _PAIR_BYTES)
+                self.requests += 1
+                self.pairs += count
+                pairs = np.frombuffer(data, dtype=np.uint8).reshape(count, _PAIR_BYTES)
+                error = _request_error(pairs, rounds)
+                if error is not None:
+                    payload = error.encode()
+                    async with lock:
+                        writer.write(_HEADER.pack(_OP_ERROR, request_id, len(payload), 0) + payload)
+                        await writer.drain()
+                    continue
+                task = asyncio.create_task(self._answer(writer, lock, request_id, pairs, rounds))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def serve(self, address: str = DEFAULT_ADDRESS):
+        """
+        Serve forever on a Unix socket path or a "host:port" TCP address.
+        """
+        where = _parse_address(address)
+        if isinstance(where, tuple):
+            server = await asyncio.start_server(self._serve_client, *where)
+        else:
+            if os.path.exists(where):
+                os.unlink(where)
+            server = await asyncio.start_unix_server(self._serve_client, where)
+        async with server:
+            await server.serve_forever()
+
+    def stats(self) -> dict:
+        """
+        Throughput, batching and latency figures since the server started.
+        """
+        elapsed = time.monotonic() - self._started
+        latencies = np.sort(np.fromiter(self._latencies, dtype=float)) * 1000
+        stats = {
+            "uptime": elapsed,
+            "clients": self.clients,
+            "requests": self.requests,
+            "pairs": self.pairs,
+            "batches": self.batches,
+            "mean_batch": self.pairs / self.batches if self.batches else 0.0,
+            "duplicates": self.duplicates,
+            "pairs_per_second": self.pairs / elapsed if elapsed else 0.0,
+            "engine_utilization": self.busy / elapsed if elapsed else 0.0,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "latency_ms_p99": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        }
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+
+def _payload_size(op: int, count: int) -> int:
+    """
+    Results come as count rows of 3 int32s; stats and errors as count bytes.
+    """
+    return count * 3 * _RESULT_DTYPE.itemsize if op == _OP_RESULT else count
+
+
+def _decode(op: int, count: int, payload: bytes) -> np.ndarray:
+    if op == _OP_ERROR:
+        raise ValueError(payload.decode())
+    return np.frombuffer(payload, dtype=_RESULT_DTYPE).reshape(count, 3).astype(np.int32)
+
+
+class DuelClient:
+    """
+    Blocking client. battle / battle_many match the _PyPacwar functions, so
+    a client can stand in for a duel backend (e.g. the cache= arguments).
+    """
+
+    def __init__(self, address: str = DEFAULT_ADDRESS):
+        where = _parse_address(address)
+        family = socket.AF_INET if isinstance(where, tuple) else socket.AF_UNIX
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        self._sock.connect(where)
+        self._next_id = 0
+
+    def _recv(self, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = self._sock.recv(size)
+            if not chunk:
+                raise ConnectionError("duel server closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def _request(self, op: int, count: int, rounds: int, payload: bytes):
+        self._next_id += 1
+        self._sock.sendall(_HEADER.pack(op, self._next_id, count, rounds) + payload)
+        op, _, count, _ = _HEADER.unpack(self._recv(_HEADER.size))
+        return op, count, self._recv(_payload_size(op, count))
+
+    def battle_many(self, genes_a, genes_b, rounds: int = 500) -> np.ndarray:
+        _check_rounds(rounds)
+        count, payload = _pairs_payload(genes_a, genes_b)
+        op, count, data = self._request(_OP_BATTLE, count, rounds, payload)
+        return _decode(op, count, data)
+
+    def battle(self, g1, g2, rounds: int = 500) -> tuple[int, int, int]:
+        rounds, c1, c2 = self.battle_many(g1, g2, rounds=rounds)[0].tolist()
+        return rounds, c1, c2
+
+    def stats(self) -> dict:
+        _, _, data = self._request(_OP_STATS, 0, 0, b"")
+        return json.loads(data)
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncDuelClient:
+    """
+    asyncio client; any number of requests may be in flight at once, and the
+    server batches them together. Create with `await AsyncDuelClient.connect()`.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._pending: dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, address: str = DEFAULT_ADDRESS) -> "AsyncDuelClient":
+        where = _parse_address(address)
+        if isinstance(where, tuple):
+            reader, writer = await asyncio.open_connection(*where)
+        else:
+            reader, writer = await asyncio.open_unix_connection(where)
+        return cls(reader, writer)
+
+    async def _receive(self):
+        try:
+            while True:
+                op, request_id, count, _ = _HEADER.unpack(await self._reader.readexactly(_HEADER.size))
+                data = await self._reader.readexactly(_payload_size(op, count))
+                future = self._pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((op, count, data))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"duel server closed the connection: {e}"))
+            self._pending.clear()
+
+    async def _request(self, op: int, count: int, rounds: int, payload: bytes):
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        self._writer.write(_HEADER.pack(op, self._next_id, count, rounds) + payload)
+        await self._writer.drain()
+        return await future
+
+    async def battle_many(self, genes_a, genes_b, rounds: int = 500) -> np.ndarray:
+        _check_rounds(rounds)
+        count, payload = _pairs_payload(genes_a, genes_b)
+        op, count, data = await self._request(_OP_BATTLE, count, rounds, payload)
+        return _decode(op, count, data)
+
+    async def battle(self, g1, g2, rounds: int = 500) -> tuple[int, int, int]:
+        rounds, c1, c2 = (await self.battle_many(g1, g2, rounds=rounds))[0].tolist()
+        return rounds, c1, c2
+
+    async def stats(self) -> dict:
+        _, _, data = await self._request(_OP_STATS, 0, 0, b"")
+        return json.loads(data)
+
+    async def close(self):
+        self._writer.close()
+        self._receiver.cancel()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Pacwar duels to local clients.")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS,
+                        help="Unix socket path or host:port (default %(default)s)")
+    parser.add_argument("--engine", default="bitplane", help="_PyPacwar engine to use")
+    parser.add_argument("--cache", default=duelcache.DEFAULT_PATH,
+                        help="SQLite result cache, or 'none' (default %(default)s)")
+    parser.add_argument("--max-batch", type=int, default=4096)
+    parser.add_argument("--max-delay", type=float, default=0.002, help="seconds")
+    args = parser.parse_args()
+
+    _PyPacwar.set_engine(args.engine)
+    cache = None if args.cache == "none" else duelcache.DuelCache(args.cache)
+    server = DuelServer(cache, max_batch=args.max_batch, max_delay=args.max_delay)
+    try:
+        asyncio.run(server.serve(args.address))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Island-model genetic algorithm.
+
+Each island is a population of genes that evolves by tournament selection,
+crossover (uniform, or whole gene tables u / v / w / x / y / z at a time)
+and per-allele mutation, with its best genes carried over unchanged. The
+islands evolve independently on a process pool for `migration_interval`
+generations at a time; in between, each island's best `migrants` replace
+the worst of the next island around the ring. Fitness is myGene.evaluate's
+mean score_once against a shared opponent pool, and a generation's
+offspring are all played in one battle_many call.
+
+    best, value, history = ga.evolve(opponents, islands=4, generations=200)
+
+Every island draws from its own numpy Generator, so a run is reproducible
+for a given seed and does not depend on the number of workers.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import _PyPacwar
+from myGene import GENE_LEN, score_once_array
+from sharedcache import SharedDuelCache
+
+# The gene tables within the 50 loci, as in PacWar.h
+TABLES = {
+    "u": slice(0, 4),
+    "v": slice(4, 20),
+    "w": slice(20, 23),
+    "x": slice(23, 26),
+    "y": slice(26, 38),
+    "z": slice(38, 50),
+}
+_TABLE_OF_LOCUS = np.concatenate([np.full(s.stop - s.start, t) for t, s in enumerate(TABLES.values())])
+
+
+def fitness(genes: np.ndarray, opponents: np.ndarray, cache=None) -> np.ndarray:
+    """
+    Mean score_once of each gene against the opponent pool, with all
+    duels in one battle_many call. Repeated genes are only played once.
+
+    Args:
+        genes: (P, 50) genes
+        opponents: (M, 50) opponent pool
+        cache: Optional duelcache.DuelCache or sharedcache.SharedDuelCache
+
+    Returns:
+        A (P,) float array
+    """
+    unique, inverse = np.unique(genes, axis=0, return_inverse=True)
+    m = len(opponents)
+    results = (_PyPacwar if cache is None else cache).battle_many(
+        np.repeat(unique, m, axis=0), np.tile(opponents, (len(unique), 1))
+    )
+    values = score_once_array(results)[:, 0].reshape(len(unique), m).mean(axis=1)
+    return values[inverse.reshape(-1)]
+
+
+def tournament_select(rng: np.random.Generator, values: np.ndarray, n: int, size: int = 3) -> np.ndarray:
+    """
+    Indices of n winners of tournaments among `size` random entrants each.
+    """
+    entrants = rng.integers(len(values), size=(n, size))
+    return entrants[np.arange(n), values[entrants].argmax(axis=1)]
+
+
+def uniform_crossover(rng: np.random.Generator, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Each allele of each child from either parent with even odds.
+    """
+    return np.where(rng.random(a.shape) < 0.5, a, b)
+
+
+def table_crossover(rng: np.random.Generator, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Each of the six gene tables of each child comes whole from either
+    parent, so rules that only work together stay together.
+    """
+    from_a = rng.random((len(a), len(TABLES))) < 0.5
+    return np.where(from_a[:, _TABLE_OF_LOCUS], a, b)
+
+
+def mutate(rng: np.random.Generator, genes: np.ndarray, rate: float) -> np.ndarray:
+    """
+    Copy with each allele replaced by a random one with probability `rate`.
+    """
+    hit = rng.random(genes.shape) < rate
+    return np.where(hit, rng.integers(4, size=genes.shape, dtype=genes.dtype), genes)
+
+
+_CROSSOVERS = {"uniform": uniform_crossover, "table": table_crossover}
+
+
+class Island:
+    """
+    One population and the random stream it evolves with.
+
+    Args:
+        genes: (P, 50) initial population
+        rng: The island's random Generator
+    """
+
+    def __init__(self, genes: np.ndarray, rng: np.random.Generator):
+        self.genes = np.asarray(genes, dtype=np.uint8)
+        self.rng = rng
+        self.values: Optional[np.ndarray] = None
+
+    def generation(self, opponents: np.ndarray, crossover: str = "table", crossover_rate: float = 0.9,
+                   mutation_rate: float = 1 / GENE_LEN, tournament_size: int = 3, elites: int = 2,
+                   cache=None) -> None:
+        """
+        Replace the population with the elites plus as many offspring.
+        """
+        if self.values is None:
+            self.values = fitness(self.genes, opponents, cache=cache)
+        rng, n = self.rng, len(self.genes)
+        elite = np.argsort(-self.values, kind="stable")[:elites]
+        k = n - len(elite)
+
+        a = self.genes[tournament_select(rng, self.values, k, tournament_size)]
+        b = self.genes[tournament_select(rng, self.values, k, tournament_size)]
+        crossed = _CROSSOVERS[crossover](rng, a, b)
+        children = np.where((rng.random(k) < crossover_rate)[:, None], crossed, a)
+        children = mutate(rng, children, mutation_rate)
+
+        self.genes = np.concatenate([self.genes[elite], children])
+        self.values = np.concatenate([self.values[elite], fitness(children, opponents, cache=cache)])
+
+    def best(self) -> tuple[np.ndarray, float]:
+        i = int(np.argmax(self.values))
+        return self.genes[i], float(self.values[i])
+
+
+def _evolve(island: Island, generations: int, opponents: np.ndarray, options: dict, engine, cache) -> Island:
+    # process-pool task: run one island for a migration interval
+    _PyPacwar.set_engine(engine[0])
+    _PyPacwar.set_cycle_detection(engine[1])
+    for _ in range(generations):
+        island.generation(opponents, cache=cache, **options)
+    return island
+
+
+def _migrate(islands: list[Island], migrants: int) -> None:
+    # ring migration: island i's best replace island i + 1's worst, all
+    # chosen before any island changes
+    best = [np.argsort(-isl.values, kind="stable")[:migrants] for isl in islands]
+    moving = [(isl.genes[b].copy(), isl.values[b].copy()) for isl, b in zip(islands, best)]
+    for i, isl in enumerate(islands):
+        genes, values = moving[i - 1]
+        worst = np.argsort(isl.values, kind="stable")[:migrants]
+        isl.genes[worst] = genes
+        isl.values[worst] = values
+
+
+def evolve(
+    opponents,
+    islands: int = 4,
+    population: int = 64,
+    generations: int = 100,
+    migration_interval: int = 10,
+    migrants: int = 2,
+    crossover: str = "table",
+    crossover_rate: float = 0.9,
+    mutation_rate: float = 1 / GENE_LEN,
+    tournament_size: int = 3,
+    elites: int = 2,
+    workers: Optional[int] = None,
+    seed: Optional[int] = None,
+    cache=None,
+    verbose: bool = False,
+) -> tuple[list[int], float, list[float]]:
+    """
+    Run the island GA against a fixed opponent pool.
+
+    Args:
+        opponents: (M, 50) opponent pool every gene is scored against
+        islands: Number of islands
+        population: Genes per island
+        generations: Total generations per island
+        migration_interval: Generations between migrations
+        migrants: Genes each island sends to the next one per migration
+        crossover: "table" (whole u/v/w/x/y/z tables) or "uniform"
+        crossover_rate: Share of offspring made by crossover (the rest are
+            mutated copies of one parent)
+        mutation_rate: Per-allele mutation probability
+        tournament_size: Entrants per selection tournament
+        elites: Best genes each island keeps unchanged per generation
+        workers: Processes to run islands on (defaults to one per island,
+            at most the CPU count); 1 runs everything in this process
+        seed: Seed for the initial populations and all random streams
+        cache: Optional duel cache; a sharedcache.SharedDuelCache is shared
+            with the workers, any other cache is only used when workers is 1
+        verbose: Print the best value after each migration interval
+
+    Returns:
+        (best gene, its fitness, best fitness after each interval)
+    """
+    if islands < 1:
+        raise ValueError("islands must be positive")
+    if generations < 1:
+        raise ValueError("generations must be positive")
+    if migration_interval < 1:
+        raise ValueError("migration_interval must be positive")
+    if crossover not in _CROSSOVERS:
+        raise ValueError(f"crossover must be one of {sorted(_CROSSOVERS)}")
+    if not 0 <= elites < population or not 0 <= migrants < population:
+        raise ValueError("elites and migrants must be smaller than the population")
+    if not 1 <= tournament_size <= population:
+        raise ValueError("tournament_size must be between 1 and the population")
+    opponents = np.asarray(opponents, dtype=np.uint8).reshape(-1, GENE_LEN)
+    seeds = np.random.SeedSequence(seed).spawn(islands)
+    pool_islands = []
+    for s in seeds:
+        rng = np.random.default_rng(s)
+        pool_islands.append(Island(rng.integers(4, size=(population, GENE_LEN), dtype=np.uint8), rng))
+    options = dict(crossover=crossover, crossover_rate=crossover_rate, mutation_rate=mutation_rate,
+                   tournament_size=tournament_size, elites=elites)
+    engine = (_PyPacwar.get_engine(), _PyPacwar.get_cycle_detection())
+    workers = workers or min(islands, os.cpu_count() or 1)
+
+    history = []
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        if pool is not None:
+            # only a shared-memory cache is visible to the workers
+            cache = cache if isinstance(cache, SharedDuelCache) else None
+        done = 0
+        while done < generations:
+            step = min(migration_interval, generations - done)
+            if pool is None:
+                pool_islands = [_evolve(isl, step, opponents, options, engine, cache) for isl in pool_islands]
+            else:
+                futures = [pool.submit(_evolve, isl, step, opponents, options, engine, cache) for isl in pool_islands]
+                pool_islands = [f.result() for f in futures]
+            done += step
+            if done < generations and islands > 1:
+                _migrate(pool_islands, migrants)
+            history.append(max(isl.best()[1] for isl in pool_islands))
+            if verbose:
+                print(f"generation {done}: best {history[-1]:.3f}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    gene, value = max((isl.best() for isl in pool_islands), key=lambda b: b[1])
+    return gene.tolist(), value, history
@@ -0,0 +1,108 @@
+"""
+Compact immutable gene type.
+
+A Gene is a bytes object of exactly 50 alleles (0-3), one byte each. The
+_PyPacwar functions read bytes-like genes in place through the buffer
+protocol, so a Gene (or a list of them, or an (N, 50) uint8 array) goes to
+the simulator without the per-call conversion a list of ints needs:
+
+    g = Gene("11111111111111111111111111111111111111111111111111")
+    _PyPacwar.battle(g, Gene.random())
+    _PyPacwar.battle_many([g, g.mutate(3)], Gene.random())
+
+Genes hash and compare as bytes, so they work as dict keys and set members.
+pack() gives the 13-byte, 2-bits-per-allele form used by duelcache.
+"""
+import random as _random
+from typing import Optional
+
+import numpy as np
+
+GENE_LENGTH = 50
+
+
+def as_array(genes) -> np.ndarray:
+    """
+    Genes in any form _PyPacwar takes (Gene or bytes, lists of them,
+    integer sequences and arrays) as a uint8 array, (N, 50) or (50,).
+    """
+    if isinstance(genes, (bytes, bytearray)):
+        return np.frombuffer(genes, dtype=np.uint8)
+    if isinstance(genes, (list, tuple)) and genes and isinstance(genes[0], (bytes, bytearray)):
+        return np.frombuffer(b"".join(genes), dtype=np.uint8).reshape(len(genes), -1)
+    return np.asarray(genes, dtype=np.uint8)
+
+
+class Gene(bytes):
+    """
+    50 alleles in 0..3. Accepts a string of digits, a sequence of ints,
+    bytes, or a numpy array.
+    """
+    __slots__ = ()
+
+    def __new__(cls, alleles):
+        if isinstance(alleles, Gene):
+            return alleles
+        if isinstance(alleles, str):
+            alleles = alleles.encode("ascii")
+            if alleles.strip(b"0123"):
+                raise ValueError("gene alleles must be in 0..3")
+            data = bytes(c - 48 for c in alleles)
+        elif isinstance(alleles, np.ndarray):
+            data = alleles.astype(np.uint8).tobytes()
+        else:
+            data = bytes(alleles)
+        if len(data) != GENE_LENGTH:
+            raise ValueError(f"a gene has {GENE_LENGTH} alleles, got {len(data)}")
+        if max(data) > 3:
+            raise ValueError("gene alleles must be in 0..3")
+        return super().__new__(cls, data)
+
+    @classmethod
+    def random(cls, rng: Optional[_random.Random] = None) -> "Gene":
+        rng = rng or _random
+        return cls(rng.randint(0, 3) for _ in range(GENE_LENGTH))
+
+    @classmethod
+    def from_packed(cls, packed: bytes) -> "Gene":
+        """
+        Inverse of pack().
+        """
+        bits = np.frombuffer(packed, dtype=np.uint8)
+        alleles = np.stack([bits >> 6, bits >> 4, bits >> 2, bits], axis=1) & 3
+        return cls(alleles.reshape(-1)[:GENE_LENGTH])
+
+    def pack(self) -> bytes:
+        """
+        13 bytes, 2 bits per allele (the layout of duelcache.pack_genes).
+        """
+        padded = np.zeros(52, dtype=np.uint8)
+        padded[:GENE_LENGTH] = np.frombuffer(self, dtype=np.uint8)
+        return ((padded[0::4] << 6) | (padded[1::4] << 4) | (padded[2::4] << 2) | padded[3::4]).tobytes()
+
+    def mutate(self, n: int = 1, rng: Optional[_random.Random] = None) -> "Gene":
+        """
+        Copy with n distinct loci each changed to one of the three other
+        alleles, as in myGene.mutate_gene.
+        """
+        rng = rng or _random
+        data = bytearray(self)
+        for position in rng.sample(range(GENE_LENGTH), n):
+            data[position] = rng.choice([a for a in range(4) if a != data[position]])
+        return Gene(data)
+
+    def crossover(self, other: "Gene", rng: Optional[_random.Random] = None) -> "Gene":
+        """
+        Uniform crossover: each allele from either parent with even odds.
+        """
+        rng = rng or _random
+        return Gene(a if rng.random() < 0.5 else b for a, b in zip(self, other))
+
+    def tolist(self) -> list[int]:
+        return list(self)
+
+    def __str__(self) -> str:
+        return "".join(map(str, self))
+
+    def __repr__(self) -> str:
+        return f"Gene('{self}')"
@@ -1,10 +1,27 @@
+import os
 import random
+from concurrent.futures import Executor, ProcessPoolExecutor
 import numpy as np
 import _PyPacwar
+from gene import as_array
+from sharedcache import SharedDuelCache
 
 GENE_LEN = 50
 ALLELES = (0, 1, 2, 3)
 
+# Best possible score_once value: a quick win (20) plus the largest
+# tiebreak, every one of the 19 x 9 interior cells ours
+MAX_DUEL_POINTS = 20 + 1e-2 * 171
+
+# The fixed opponents every random restart plays, besides random genes
+REFERENCE_GENES = [
+    [0] * 50,
+    [1] * 50,
+    [2] * 50,
+    [3] * 50,
+    ([0, 1, 2, 3] * 12) + [0, 1],
+]
+
 
 def random_gene() -> list[int]:
     return [random.choice(ALLELES) for _ in range(GENE_LEN)]
@@ -53,15 +70,392 @@ def duel_points(rounds: int, c_me: int, c_opp: int) -> int:
     return 10
 
 
-def score_once(me: list[int], opp: list[int]) -> float:
-    rounds, c_me, c_opp = _PyPacwar.battle(me, opp)
+def _duel_points_vec(rounds: np.ndarray, c_me: np.ndarray, c_opp: np.ndarray) -> np.ndarray:
+    # duel_points, elementwise
+    band = np.minimum(rounds // 100, 3)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = c_me / c_opp
+    return np.select(
+        [
+            (c_opp == 0) & (c_me > 0),
+            (c_me == 0) & (c_opp > 0),
+            c_opp == 0,
+            c_me == 0,
+            ratio >= 10.0,
+            ratio >= 3.0,
+            ratio >= 1.5,
+            ratio <= 1.0 / 10.0,
+            ratio <= 1.0 / 3.0,
+            ratio <= 1.0 / 1.5,
+        ],
+        [20 - band, band, 13, 7, 13, 12, 11, 7, 8, 9],
+        10,
+    )
+
+
+def duel_points_array(results) -> np.ndarray:
+    # duel_points for both sides of every (rounds, c1, c2) row of an (N, 3)
+    # array, e.g. from _PyPacwar.battle_many; returns an (N, 2) int array
+    results = np.asarray(results, dtype=np.int64).reshape(-1, 3)
+    rounds, c1, c2 = results.T
+    return np.stack([_duel_points_vec(rounds, c1, c2), _duel_points_vec(rounds, c2, c1)], axis=1)
+
+
+def score_once_array(results) -> np.ndarray:
+    # score_once for both sides of every row; returns an (N, 2) float array
+    results = np.asarray(results, dtype=np.int64).reshape(-1, 3)
+    diff = results[:, 1] - results[:, 2]
+    return duel_points_array(results) + 1e-2 * np.stack([diff, -diff], axis=1)
+
+
+def score_once(me: list[int], opp: list[int], cache=None) -> float:
+    # cache: an optional duelcache.DuelCache to play through
+    rounds, c_me, c_opp = (_PyPacwar if cache is None else cache).battle(me, opp)
     pts = duel_points(rounds, c_me, c_opp)
     # no ties
     return pts + 1e-2 * (c_me - c_opp) 
 
 
-def evaluate(me: list[int], opponents: list[list[int]]) -> float:
-    return float(np.mean([score_once(me, o) for o in opponents]))
+def evaluate(me: list[int], opponents: list[list[int]], cache=None) -> float:
+    # one native call for the whole opponent set instead of a battle() per duel
+    results = (_PyPacwar if cache is None else cache).battle_many(me, opponents)
+    return float(np.mean(score_once_array(results)[:, 0]))
+
+
+class ScreeningEvaluator:
+    # Two-stage evaluate(): a candidate first plays a short duel of
+    # screen_rounds against every opponent, scored with score_once_array
+    # (an elimination inside the horizon is final, otherwise the count
+    # ratio decides). Only candidates whose screen value comes within
+    # `margin` of the threshold are promoted to the full 500-round
+    # evaluate(); a random audit_rate of the rejects are too, to measure
+    # how often screening throws away a winner. stats() reports the
+    # disagreement between the screen and the full result, for tuning
+    # screen_rounds and margin per search.
+
+    def __init__(
+        self,
+        screen_rounds: int = 120,
+        margin: float = 0.5,
+        audit_rate: float = 0.05,
+        seed: int | None = None,
+        cache=None,
+    ):
+        if margin < 0:
+            raise ValueError("margin must not be negative")
+        self.screen_rounds = screen_rounds
+        self.margin = margin
+        self.audit_rate = audit_rate
+        self.cache = cache
+        self._rng = random.Random(seed)
+        self.screened = 0
+        self.skipped = 0
+        self.promoted = 0
+        self.audited = 0
+        self.false_rejects = 0
+        self.disagreements = 0
+        self.abs_error = 0.0
+
+    def evaluate(self, me: list[int], opponents: list[list[int]], threshold: float) -> float:
+        # The full evaluate() value when it was computed, otherwise the
+        # screen value, which is then below threshold
+        results = _PyPacwar.battle_many(me, opponents, rounds=self.screen_rounds)
+        screen = float(np.mean(score_once_array(results)[:, 0]))
+        self.screened += 1
+        promote = screen + self.margin > threshold
+        # draw for every candidate, so the audit stream does not depend on
+        # the thresholds
+        audit = self._rng.random() < self.audit_rate and not promote
+        if not (promote or audit):
+            self.skipped += 1
+            return screen
+
+        full = evaluate(me, opponents, cache=self.cache)
+        self.abs_error += abs(screen - full)
+        if (screen > threshold) != (full > threshold):
+            self.disagreements += 1
+        if promote:
+            self.promoted += 1
+        else:
+            self.audited += 1
+            if full > threshold:
+                self.false_rejects += 1
+        return full
+
+    def stats(self) -> dict:
+        full = self.promoted + self.audited
+        return {
+            "screened": self.screened,
+            "skipped": self.skipped,
+            "promoted": self.promoted,
+            "audited": self.audited,
+            "false_rejects": self.false_rejects,
+            "false_reject_rate": self.false_rejects / self.audited if self.audited else 0.0,
+            "disagreement_rate": self.disagreements / full if full else 0.0,
+            "mean_abs_error": self.abs_error / full if full else 0.0,
+        }
+
+
+class SurrogateEvaluator:
+    # evaluate() behind a learned filter. A linear model per opponent over
+    # one-hot locus features (allele a at locus i -> feature 4 * i + a,
+    # plus a bias) predicts the score_once value of `me` against that
+    # opponent; it is trained online by normalized SGD (each step moves the
+    # prediction learning_rate of the way to the target) on every duel
+    # actually played.
+    # After `warmup` simulated candidates, a candidate is only simulated
+    # when its predicted mean comes within `margin` of the threshold, or
+    # for a random audit_rate of the rejects, which measure what the
+    # filter throws away. stats() reports the filter's precision (promoted
+    # candidates that really beat the threshold) and recall (real winners
+    # that were promoted, estimated from the audits), for tuning margin to
+    # a throughput target. Drop-in for ScreeningEvaluator as screen=.
+    # The model ranks single-locus neighbors barely better than chance, so
+    # the defaults only drop clear losers: in hill_climb, margin 4 kept
+    # 91-98% of the winners while filtering 2-5% of the candidates (margin
+    # 2 filtered 40-60% but kept only 17-40%). iterate_single's minimum over
+    # the winners needs about margin 8 for the same recall.
+
+    def __init__(
+        self,
+        margin: float = 4.0,
+        warmup: int = 200,
+        learning_rate: float = 0.5,
+        audit_rate: float = 0.2,
+        seed: int | None = None,
+        cache=None,
+    ):
+        if margin < 0:
+            raise ValueError("margin must not be negative")
+        self.margin = margin
+        self.warmup = warmup
+        self.learning_rate = learning_rate
+        self.audit_rate = audit_rate
+        self.cache = cache
+        self._rng = random.Random(seed)
+        self._rows: dict[bytes, int] = {}
+        # one weight row per opponent seen: 4 * GENE_LEN alleles, then bias
+        self._weights = np.zeros((0, 4 * GENE_LEN + 1))
+        self.observed = 0
+        self.screened = 0
+        self.skipped = 0
+        self.filtered = 0
+        self.promoted = 0
+        self.true_promotions = 0
+        self.audited = 0
+        self.false_rejects = 0
+        self.abs_error = 0.0
+        self.duels = 0
+
+    def _opponent_rows(self, opponents: list[list[int]]) -> np.ndarray:
+        keys = [as_array(o).tobytes() for o in opponents]
+        new = [k for k in dict.fromkeys(keys) if k not in self._rows]
+        if new:
+            for k in new:
+                self._rows[k] = len(self._rows)
+            grown = np.zeros((len(self._rows), self._weights.shape[1]))
+            grown[:, -1] = 10.0  # start every opponent at an even duel
+            grown[:len(self._weights)] = self._weights
+            self._weights = grown
+        return np.array([self._rows[k] for k in keys], dtype=np.intp)
+
+    @staticmethod
+    def _features(me: list[int]) -> np.ndarray:
+        return 4 * np.arange(GENE_LEN) + as_array(me).astype(np.intp)
+
+    def predict(self, me: list[int], opponents: list[list[int]]) -> np.ndarray:
+        # predicted score_once value against each opponent
+        rows = self._opponent_rows(opponents)
+        w = self._weights[rows]
+        return w[:, self._features(me)].sum(axis=1) + w[:, -1]
+
+    def observe(self, me: list[int], opponents: list[list[int]], points) -> None:
+        # one SGD step per opponent on played score_once values
+        if not len(opponents):
+            return
+        rows = self._opponent_rows(opponents)
+        features = self._features(me)
+        err = np.asarray(points, dtype=float) - self.predict(me, opponents)
+        self.abs_error += float(np.abs(err).sum())
+        self.duels += len(err)
+        step = self.learning_rate / (GENE_LEN + 1) * err
+        # rows may repeat, so accumulate rather than assign
+        np.add.at(self._weights, (rows[:, None], features[None, :]), step[:, None])
+        np.add.at(self._weights, (rows, -1), step)
+        self.observed += 1
+
+    def screen(self, predicted: float, threshold: float) -> tuple[bool, bool]:
+        # (promote, audit) for a candidate with this predicted value; the
+        # audit draw is made for every candidate, so the audit stream does
+        # not depend on the thresholds
+        self.screened += 1
+        audit = self._rng.random() < self.audit_rate
+        if self.observed < self.warmup:
+            return True, False
+        promote = predicted + self.margin > threshold
+        if not promote:
+            self.filtered += 1
+        return promote, audit and not promote
+
+    def record(self, promoted: bool, passed: bool, warm: bool = True) -> None:
+        # outcome of a simulated candidate, for precision and recall
+        if not warm:
+            return
+        if promoted:
+            self.promoted += 1
+            self.true_promotions += passed
+        else:
+            self.audited += 1
+            self.false_rejects += passed
+
+    def evaluate(self, me: list[int], opponents: list[list[int]], threshold: float) -> float:
+        # The full evaluate() value when it was computed, otherwise the
+        # prediction, which is then not above threshold
+        predicted = float(np.mean(self.predict(me, opponents)))
+        warm = self.observed >= self.warmup
+        promote, audit = self.screen(predicted, threshold)
+        if not (promote or audit):
+            self.skipped += 1
+            return predicted
+
+        results = (_PyPacwar if self.cache is None else self.cache).battle_many(me, opponents)
+        points = score_once_array(results)[:, 0]
+        full = float(np.mean(points))
+        self.observe(me, opponents, points)
+        self.record(promote, full > threshold, warm)
+        return full
+
+    def stats(self) -> dict:
+        # recall counts each audited false reject for the 1 / audit_rate
+        # rejects it stands for. The ratios are None until there is data
+        # for them; mean_abs_error is per played duel, measured before the
+        # model learns from it.
+        found = self.true_promotions
+        if not self.filtered:
+            missed = 0.0
+        elif self.audited:
+            missed = self.false_rejects / self.audited * self.filtered
+        else:
+            missed = None
+        return {
+            "screened": self.screened,
+            "simulated": self.observed,
+            "skipped": self.skipped,
+            "filtered": self.filtered,
+            "filter_rate": self.filtered / self.screened if self.screened else None,
+            "promoted": self.promoted,
+            "audited": self.audited,
+            "false_rejects": self.false_rejects,
+            "precision": found / self.promoted if self.promoted else None,
+            "recall": found / (found + missed) if missed is not None and found + missed else None,
+            "mean_abs_error": self.abs_error / self.duels if self.duels else None,
+        }
+
+
+def evaluate_bounded(
+    me: list[int],
+    opponents: list[list[int]],
+    threshold: float,
+    order: list[int] | None = None,
+    cache=None,
+) -> tuple[float, list[float | None]]:
+    # evaluate(), but gives up as soon as the mean can no longer exceed
+    # `threshold`, even if every remaining duel were a MAX_DUEL_POINTS win.
+    # Duels are played in `order` (indices into opponents), so put the most
+    # discriminating opponents first (see order_opponents).
+    # Returns (value, points): value is the exact mean when all duels were
+    # played, otherwise the upper bound at the abort (never above threshold);
+    # points holds the score_once value per opponent, None where unplayed.
+    backend = _PyPacwar if cache is None else cache
+    n = len(opponents)
+    points: list[float | None] = [None] * n
+    total = 0.0
+    for played, i in enumerate(order if order is not None else range(n), start=1):
+        rounds, c_me, c_opp = backend.battle(me, opponents[i])
+        points[i] = duel_points(rounds, c_me, c_opp) + 1e-2 * (c_me - c_opp)
+        total += points[i]
+        bound = (total + (n - played) * MAX_DUEL_POINTS) / n
+        if played < n and bound + 1e-9 < threshold:
+            return bound, points
+    # same summation order as evaluate(), so the values compare exactly
+    return float(np.mean(points)), points
+
+
+def order_opponents(points: list[float]) -> list[int]:
+    # Opponent indices, the ones `me` scored worst against first: candidates
+    # near `me` tend to lose those too, which pulls the bound down fastest.
+    return sorted(range(len(points)), key=points.__getitem__)
+
+
+def successive_halving(
+    candidates: list[list[int]],
+    opponents: list[list[int]],
+    min_opponents: int = 2,
+    eta: int = 2,
+    seed: int | None = None,
+    cache=None,
+) -> tuple[list[int], float, dict]:
+    # Pick the best candidate without playing every candidate against every
+    # opponent. The opponents are shuffled once; each round every surviving
+    # candidate plays the next opponents in that order (min_opponents in the
+    # first round, eta times as many in total each round after), and only
+    # the best 1/eta of them by mean score_once go on. The survivor plays
+    # any opponents it has left, so the value returned is its evaluate().
+    # Returns (best, value, stats) where stats counts the duels played and
+    # saved against evaluating every candidate exhaustively.
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+    if min_opponents < 1:
+        raise ValueError("min_opponents must be at least 1")
+    backend = _PyPacwar if cache is None else cache
+    n_opp = len(opponents)
+    perm = list(range(n_opp))
+    random.Random(seed).shuffle(perm)
+    shuffled = np.asarray(opponents)[perm]
+    points = np.zeros((len(candidates), n_opp))
+    alive = list(range(len(candidates)))
+    played = 0
+    upto = 0
+    target = min(min_opponents, n_opp)
+    rounds = 0
+    while True:
+        for c in alive:
+            if target > upto:
+                results = backend.battle_many(candidates[c], shuffled[upto:target])
+                points[c, upto:target] = score_once_array(results)[:, 0]
+        played += len(alive) * (target - upto)
+        upto = target
+        rounds += 1
+        if len(alive) == 1 or upto == n_opp:
+            break
+        keep = -(-len(alive) // eta)
+        alive = sorted(alive, key=lambda c: -points[c, :upto].sum())[:keep]
+        target = min(n_opp, target * eta)
+
+    if upto < n_opp:
+        results = backend.battle_many(candidates[alive[0]], shuffled[upto:])
+        points[alive[0], upto:] = score_once_array(results)[:, 0]
+        played += n_opp - upto
+
+    # back to the caller's opponent order, so the means match evaluate()
+    values = {c: float(np.mean(points[c, np.argsort(perm)])) for c in alive}
+    best = max(alive, key=lambda c: values[c])
+    exhaustive = len(candidates) * n_opp
+    stats = {
+        "rounds": rounds,
+        "duels": played,
+        "exhaustive_duels": exhaustive,
+        "duels_saved": exhaustive - played,
+    }
+    return candidates[best], values[best], stats
+
+
+def trace_duels(me: list[int], opponents: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    # per-opponent score_once values, plus the 50-bit mask of loci of `me`
+    # that each duel actually read, in one _PyPacwar.battle_many_loci call
+    # (which always runs on the 'cell' engine and bypasses any cache)
+    results, used = _PyPacwar.battle_many_loci(me, opponents)
+    return score_once_array(results)[:, 0], used[:, 0]
 
 
 def mutate_gene(g: list[int]) -> list[int]:
@@ -73,29 +467,216 @@ def mutate_gene(g: list[int]) -> list[int]:
     return ng
 
 
-def hill_climb(me0: list[int], opponents: list[list[int]], steps: int = 200, samples_per_step: int = 200):
+def _pool_cache(cache):
+    # the cache to hand to pool workers: only a SharedDuelCache is visible
+    # to them, any other cache stays in this process
+    return cache if isinstance(cache, SharedDuelCache) else None
+
+
+def _evaluate_chunk(cands, opponents, threshold, order, engine, cache=None):
+    # process-pool task: score candidates in sequence like the serial loop,
+    # raising the bound threshold as the chunk finds better ones
+    _PyPacwar.set_engine(engine[0])
+    _PyPacwar.set_cycle_detection(engine[1])
+    scored = []
+    for cand in cands:
+        if order is None:
+            scored.append((evaluate(cand, opponents, cache=cache), None))
+        else:
+            v, points = evaluate_bounded(cand, opponents, threshold, order=order, cache=cache)
+            threshold = max(threshold, v)
+            scored.append((v, points))
+    return scored
+
+
+def _evaluate_parallel(pool, cands, opponents, threshold, order, chunk_size, cache=None):
+    # (value, points) per candidate, in candidate order
+    engine = (_PyPacwar.get_engine(), _PyPacwar.get_cycle_detection())
+    cache = _pool_cache(cache)
+    futures = [
+        pool.submit(_evaluate_chunk, cands[i:i + chunk_size], opponents, threshold, order, engine, cache)
+        for i in range(0, len(cands), chunk_size)
+    ]
+    return [item for f in futures for item in f.result()]
+
+
+def hill_climb(
+    me0: list[int],
+    opponents: list[list[int]],
+    steps: int = 200,
+    samples_per_step: int = 200,
+    reuse_inert: bool = False,
+    bounded: bool = False,
+    cache=None,
+    screen: ScreeningEvaluator | SurrogateEvaluator | None = None,
+    workers: int = 1,
+    pool: Executor | None = None,
+    chunk_size: int = 25,
+):
+    # reuse_inert: trace which loci each duel of `me` read, and only replay
+    # a candidate's duels that read its mutated locus (the others would
+    # replay identically), through the selected engine and the cache. Same
+    # results, fewer duels; but tracing runs on the slower 'cell' engine
+    # for every new incumbent, and opponents that read most of the gene
+    # leave little to skip, so measure before relying on it.
+    # bounded: abandon a candidate once it provably cannot beat the best
+    # neighbor so far (evaluate_bounded), playing the opponents the
+    # incumbent does worst against first. Same results, fewer duels.
+    # cache: an optional duelcache.DuelCache for the evaluate() path
+    # screen: score candidates with this ScreeningEvaluator or
+    # SurrogateEvaluator instead, so only promising ones play the full
+    # duels (serial path only). A step whose candidates were all screened
+    # out says nothing about `me`, so it does not end the climb.
+    # workers / pool: score each step's candidates in chunks of chunk_size on
+    # a process pool (made here when workers > 1 and no pool is given). The
+    # candidates are drawn up front from the same random stream and scanned
+    # in order afterwards, so the climb matches the serial one exactly. The
+    # workers share the cache only if it is a sharedcache.SharedDuelCache;
+    # any other cache is used in this process alone.
+    if workers > 1 and pool is None:
+        with ProcessPoolExecutor(workers) as pool:
+            return hill_climb(
+                me0, opponents, steps=steps, samples_per_step=samples_per_step,
+                reuse_inert=reuse_inert, bounded=bounded, cache=cache,
+                screen=screen, pool=pool, chunk_size=chunk_size,
+            )
+    if pool is not None and (reuse_inert or screen is not None):
+        raise ValueError("reuse_inert and screen cannot be combined with a process pool")
+    if bounded and screen is not None:
+        raise ValueError("bounded and screen cannot be combined")
+    if reuse_inert and (bounded or screen is not None):
+        raise ValueError("reuse_inert cannot be combined with bounded or screen")
+
+    backend = _PyPacwar if cache is None else cache
     me = me0.copy()
-    best = evaluate(me, opponents)
+    if reuse_inert:
+        opponent_rows = as_array(opponents).reshape(-1, GENE_LEN)
+        me_points, me_used = trace_duels(me, opponent_rows)
+        best = float(np.mean(me_points))
+    elif bounded:
+        best, me_points = evaluate_bounded(me, opponents, float("-inf"), cache=cache)
+        order = order_opponents(me_points)
+    else:
+        best = evaluate(me, opponents, cache=cache)
 
     for _ in range(steps):
         improved = False
         best_neighbor = me
         best_neighbor_val = best
+        skipped = screen.skipped if screen is not None else 0
 
-        for _ in range(samples_per_step):
-            cand = mutate_gene(me)
-            v = evaluate(cand, opponents)
-            if v > best_neighbor_val:
-                best_neighbor = cand
-                best_neighbor_val = v
-                improved = True
+        if pool is not None:
+            cands = [mutate_gene(me) for _ in range(samples_per_step)]
+            scored = _evaluate_parallel(
+                pool, cands, opponents, best, order if bounded else None, chunk_size, cache=cache
+            )
+            for cand, (v, points) in zip(cands, scored):
+                if v > best_neighbor_val:
+                    best_neighbor = cand
+                    best_neighbor_val = v
+                    improved = True
+                    best_points = points
+        else:
+            for _ in range(samples_per_step):
+                cand = mutate_gene(me)
+                if reuse_inert:
+                    locus = next(i for i in range(GENE_LEN) if cand[i] != me[i])
+                    replay = np.flatnonzero((me_used >> np.uint64(locus)) & np.uint64(1))
+                    points = me_points.copy()
+                    if len(replay):
+                        results = backend.battle_many(cand, opponent_rows[replay])
+                        points[replay] = score_once_array(results)[:, 0]
+                    v = float(np.mean(points))
+                elif bounded:
+                    v, points = evaluate_bounded(
+                        cand, opponents, best_neighbor_val, order=order, cache=cache
+                    )
+                elif screen is not None:
+                    v = screen.evaluate(cand, opponents, best_neighbor_val)
+                else:
+                    v = evaluate(cand, opponents, cache=cache)
+                if v > best_neighbor_val:
+                    best_neighbor = cand
+                    best_neighbor_val = v
+                    improved = True
+                    if bounded:
+                        best_points = points
 
         if not improved:
+            if screen is not None and screen.skipped - skipped == samples_per_step:
+                continue
             break
 
         me = best_neighbor
         best = best_neighbor_val
+        if reuse_inert:
+            me_points, me_used = trace_duels(me, opponent_rows)
+        elif bounded:
+            order = order_opponents(best_points)
+
+    return me, best
+
+
+def _restart(start, seed, opponents, steps, samples_per_step, bounded, engine, cache=None):
+    # process-pool task: one hill climb with its own random stream
+    random.seed(seed)
+    _PyPacwar.set_engine(engine[0])
+    _PyPacwar.set_cycle_detection(engine[1])
+    return hill_climb(
+        start, opponents, steps=steps, samples_per_step=samples_per_step, bounded=bounded,
+        cache=cache,
+    )
+
+
+def neighbor(g: list[int], k: int) -> list[int]:
+    # single-locus neighbor k of g, numbered as in _PyPacwar.neighborhood:
+    # locus k // 3 set to the (k % 3)-th of the other alleles
+    ng = list(g)
+    locus = k // 3
+    ng[locus] = [a for a in ALLELES if a != g[locus]][k % 3]
+    return ng
+
 
+def steepest_ascent(
+    me0: list[int],
+    opponents: list[list[int]],
+    steps: int = 200,
+    first_improvement: bool = False,
+    threads: int = 0,
+    cache=None,
+):
+    # Deterministic climb over all 150 single-locus neighbors per step, each
+    # step one _PyPacwar.neighborhood call. Moves to the best neighbor, or
+    # with first_improvement to the lowest-numbered one that beats `me`
+    # (the rest of the neighborhood is not played). Values are recomputed
+    # from the duel results exactly as evaluate() computes them.
+    # cache: play each neighborhood through this duel cache's battle_many
+    # instead, on one thread and always in full (first_improvement then
+    # only changes which neighbor is taken)
+    me = list(me0)
+    best = evaluate(me, opponents, cache=cache)
+    opponent_rows = as_array(opponents).reshape(-1, GENE_LEN)
+    m = len(opponent_rows)
+    for _ in range(steps):
+        if cache is None:
+            scores, results = _PyPacwar.neighborhood(
+                me, opponent_rows, threshold=best if first_improvement else None, threads=threads
+            )
+        else:
+            neighbors = as_array([neighbor(me, k) for k in range(3 * GENE_LEN)])
+            results = cache.battle_many(
+                np.repeat(neighbors, m, axis=0), np.tile(opponent_rows, (len(neighbors), 1))
+            ).reshape(len(neighbors), m, 3)
+            scores = np.zeros(len(neighbors))
+        values = np.full(len(scores), float("-inf"))
+        for k in np.flatnonzero(~np.isnan(scores)):
+            values[k] = float(np.mean(score_once_array(results[k])[:, 0]))
+        better = np.flatnonzero(values > best)
+        k = int(better[0]) if first_improvement and len(better) else int(np.argmax(values))
+        if not values[k] > best:
+            break
+        me = neighbor(me, k)
+        best = float(values[k])
     return me, best
 
 
@@ -104,26 +685,59 @@ def random_restarts_hc(
     steps: int = 150,
     samples_per_step: int = 250,
     seed: int | None = 0,
+    bounded: bool = False,
+    cache=None,
+    screen: ScreeningEvaluator | SurrogateEvaluator | None = None,
+    workers: int = 1,
+    parallel_restarts: bool = False,
 ):
+    # workers > 1: spread each climb's candidates over a process pool; the
+    # result is identical to the serial run.
+    # parallel_restarts: instead run whole restarts concurrently on the pool
+    # (workers, or one per CPU). Each restart then gets its start gene and a
+    # seed for its own random stream up front, so the result is reproducible
+    # for a given seed, though not the same as the serial run's. A screen
+    # keeps its statistics in this process, so it needs the serial path.
+    if parallel_restarts and screen is not None:
+        raise ValueError("screen cannot be combined with parallel_restarts")
     if seed is not None:
         random.seed(seed)
         np.random.seed(seed)
 
-    opponents = [
-        [0] * 50,
-        [1] * 50,
-        [2] * 50,
-        [3] * 50,
-        ([0, 1, 2, 3] * 12) + [0, 1],
-    ]
+    opponents = [g.copy() for g in REFERENCE_GENES]
     opponents += [random_gene() for _ in range(10)]
 
     global_best = None
     global_best_val = float("-inf")
 
-    for r in range(restarts):
-        start = random_gene()
-        g, v = hill_climb(start, opponents, steps=steps, samples_per_step=samples_per_step)
+    if parallel_restarts:
+        starts = [random_gene() for _ in range(restarts)]
+        seeds = [random.randrange(2**32) for _ in range(restarts)]
+        engine = (_PyPacwar.get_engine(), _PyPacwar.get_cycle_detection())
+        with ProcessPoolExecutor(workers if workers > 1 else os.cpu_count()) as pool:
+            futures = [
+                pool.submit(
+                    _restart, start, s, opponents, steps, samples_per_step, bounded, engine,
+                    _pool_cache(cache),
+                )
+                for start, s in zip(starts, seeds)
+            ]
+            climbs = [f.result() for f in futures]
+    else:
+        pool = ProcessPoolExecutor(workers) if workers > 1 else None
+        try:
+            climbs = [
+                hill_climb(
+                    random_gene(), opponents, steps=steps, samples_per_step=samples_per_step,
+                    bounded=bounded, cache=cache, screen=screen, pool=pool,
+                )
+                for _ in range(restarts)
+            ]
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    for g, v in climbs:
         if v > global_best_val:
             global_best = g
             global_best_val = v
@@ -0,0 +1,262 @@
+"""
+Novelty archive: genes indexed by how they play, not by their alleles.
+
+A gene's behavior descriptor is its result vector against a fixed
+reference set (by default myGene.REFERENCE_GENES, the all-0/1/2/3 genes and
+the 0123 pattern): per reference gene, the rounds played / 500 and both
+mite counts / 171. Its novelty is the mean distance from its descriptor to
+the k nearest descriptors in the archive.
+
+The descriptors live in a KDTree (pure NumPy), so k-nearest-neighbor
+queries stay fast as the archive grows to 100k+ entries. New entries go
+to a small buffer that is scanned directly and folded into a rebuilt tree
+once it reaches a quarter of the tree's size or max_buffer entries,
+whichever is smaller, so adding stays cheap and the scan stays short.
+
+    archive = NoveltyArchive()
+    archive.add(population)
+    scores = archive.novelty(archive.describe(candidates))
+    opponents = archive.diverse(20)       # behaviorally spread-out genes
+"""
+from typing import Optional
+
+import numpy as np
+import _PyPacwar
+from gene import as_array
+from myGene import GENE_LEN, REFERENCE_GENES
+
+# Queries measured against all leaf boxes at once
+_QUERY_CHUNK = 64
+
+
+class KDTree:
+    """
+    Static k-d tree over an (N, D) point set, queried in batches.
+
+    Points are split at the median of their widest dimension down to
+    leaves of at most leaf_size points. A batch query measures every query
+    against every leaf's bounding box at once. The points of a query's
+    nearest few leaves bound its k-th neighbor distance, and only the
+    leaves whose boxes lie within that bound are searched.
+
+    Args:
+        points: (N, D) points
+        leaf_size: Largest number of points in a leaf
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: int = 32):
+        self.points = np.asarray(points, dtype=np.float64)
+        n = len(self.points)
+        order = np.arange(n)
+        leaves = []
+        stack = [(0, n)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= leaf_size:
+                if hi > lo:
+                    leaves.append((lo, hi))
+                continue
+            idx = order[lo:hi]
+            span = self.points[idx].max(axis=0) - self.points[idx].min(axis=0)
+            dim = int(np.argmax(span))
+            mid = (hi - lo) // 2
+            order[lo:hi] = idx[np.argpartition(self.points[idx, dim], mid)]
+            stack += [(lo, lo + mid), (lo + mid, hi)]
+
+        self.order = order
+        dims = self.points.shape[1]
+        self._bounds = np.array(leaves, dtype=np.intp).reshape(-1, 2)
+        # leaf members as rows of a padded (L, leaf_size) table; padding
+        # points at an extra row that is infinitely far from everything
+        self._sorted = np.concatenate([self.points[order], np.full((1, dims), np.inf)])
+        self._members = np.full((len(self._bounds), leaf_size), n, dtype=np.intp)
+        for row, (a, b) in enumerate(self._bounds):
+            self._members[row, :b - a] = np.arange(a, b)
+        self._order = np.append(order, -1)
+        self._lo = np.array([self._sorted[a:b].min(axis=0) for a, b in self._bounds]).reshape(-1, dims)
+        self._hi = np.array([self._sorted[a:b].max(axis=0) for a, b in self._bounds]).reshape(-1, dims)
+        self.leaf_size = leaf_size
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def query(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The k nearest points of each query (fewer if the tree is smaller).
+
+        Returns:
+            (distances, indices), each (Q, k), nearest first
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+        k = min(k, len(self))
+        dist = np.full((len(queries), k), np.inf)
+        index = np.full((len(queries), k), -1, dtype=np.intp)
+        if k == 0 or not len(queries):
+            return dist, index
+        for start in range(0, len(queries), _QUERY_CHUNK):
+            chunk = slice(start, start + _QUERY_CHUNK)
+            dist[chunk], index[chunk] = self._query_chunk(queries[chunk], k)
+        return dist, index
+
+    def _query_chunk(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        dist = np.empty((len(queries), k))
+        index = np.empty((len(queries), k), dtype=np.intp)
+        # squared distance from each query to each leaf's box, (Q, L)
+        gap = np.maximum(self._lo[None] - queries[:, None], 0) + np.maximum(queries[:, None] - self._hi[None], 0)
+        box = (gap ** 2).sum(axis=2)
+        visit = np.argsort(box, axis=1)
+        box = np.take_along_axis(box, visit, axis=1)
+        # enough nearest leaves to hold k points bound the k-th distance
+        first = -(-2 * k // self.leaf_size) + 1
+        for q, point in enumerate(queries):
+            bound = self._nearest(point, visit[q, :first], k)[0][-1]
+            # then every leaf whose box is within that bound
+            reach = max(first, int(np.searchsorted(box[q], bound, side="right")))
+            d, index[q] = self._nearest(point, visit[q, :reach], k)
+            dist[q] = np.sqrt(d)
+        return dist, index
+
+    def _nearest(self, point: np.ndarray, leaves: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        # squared distances and indices of the k nearest members of leaves
+        members = self._members[leaves].reshape(-1)
+        d = ((self._sorted[members] - point) ** 2).sum(axis=1)
+        if len(d) > k:
+            part = np.argpartition(d, k - 1)[:k]
+            members, d = members[part], d[part]
+        keep = np.argsort(d, kind="stable")
+        return d[keep], self._order[members[keep]]
+
+
+class NoveltyArchive:
+    """
+    Growing archive of genes and their behavior descriptors.
+
+    Args:
+        k: Neighbors averaged in the novelty score
+        reference: Reference genes the descriptors are measured against
+        leaf_size: Leaf size of the KD-tree
+        max_buffer: Most entries kept outside the tree between rebuilds
+        cache: Optional duel cache to play the reference duels through
+    """
+
+    def __init__(self, k: int = 15, reference=None, leaf_size: int = 32, max_buffer: int = 2048,
+                 cache=None):
+        self.k = k
+        self.reference = as_array(REFERENCE_GENES if reference is None else reference).reshape(-1, GENE_LEN)
+        self.leaf_size = leaf_size
+        self.max_buffer = max_buffer
+        self.cache = cache
+        self.genes = np.zeros((0, GENE_LEN), dtype=np.uint8)
+        self.descriptors = np.zeros((0, 3 * len(self.reference)))
+        self._tree: Optional[KDTree] = None
+
+    def __len__(self) -> int:
+        return len(self.genes)
+
+    def describe(self, genes) -> np.ndarray:
+        """
+        (N, 3R) descriptors: per reference gene, rounds / 500 and the mite
+        counts of the gene and of the reference / 171.
+        """
+        genes = as_array(genes).reshape(-1, GENE_LEN)
+        r = len(self.reference)
+        results = (_PyPacwar if self.cache is None else self.cache).battle_many(
+            np.repeat(genes, r, axis=0), np.tile(self.reference, (len(genes), 1))
+        )
+        return (np.asarray(results, dtype=np.float64) / (500.0, 171.0, 171.0)).reshape(len(genes), 3 * r)
+
+    def add(self, genes, descriptors: Optional[np.ndarray] = None) -> None:
+        genes = as_array(genes).reshape(-1, GENE_LEN)
+        if descriptors is None:
+            descriptors = self.describe(genes)
+        self.genes = np.concatenate([self.genes, genes])
+        self.descriptors = np.concatenate([self.descriptors, descriptors])
+        indexed = len(self._tree) if self._tree is not None else 0
+        # rebuild once the scanned buffer outgrows a quarter of the tree
+        # (amortized O(log n) per entry while the archive is small), or
+        # max_buffer, which bounds the linear part of every query
+        if len(self) - indexed > min(max(4 * self.leaf_size, indexed // 4), self.max_buffer):
+            self._tree = KDTree(self.descriptors, self.leaf_size)
+
+    def neighbors(self, descriptors: np.ndarray, k: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (distances, archive indices) of the k nearest archive entries of
+        each descriptor, nearest first.
+        """
+        k = self.k if k is None else k
+        descriptors = np.atleast_2d(descriptors)
+        indexed = len(self._tree) if self._tree is not None else 0
+        k = min(k, len(self))
+        if self._tree is not None:
+            dist, index = self._tree.query(descriptors, k)
+        else:
+            dist = np.zeros((len(descriptors), 0))
+            index = np.zeros((len(descriptors), 0), dtype=np.intp)
+        buffer = self.descriptors[indexed:]
+        if len(buffer):
+            d = np.sqrt(((descriptors[:, None] - buffer[None]) ** 2).sum(axis=2))
+            dist = np.concatenate([dist, d], axis=1)
+            index = np.concatenate([index, np.broadcast_to(np.arange(indexed, len(self)), d.shape)], axis=1)
+            keep = np.argsort(dist, axis=1, kind="stable")[:, :k]
+            dist = np.take_along_axis(dist, keep, axis=1)
+            index = np.take_along_axis(index, keep, axis=1)
+        return dist, index
+
+    def novelty(self, descriptors: np.ndarray, exclude_self: bool = False) -> np.ndarray:
+        """
+        Mean distance to the k nearest archive entries. With exclude_self,
+        the descriptors are taken to be in the archive already, and the
+        nearest match (themselves) is skipped.
+        """
+        dist, _ = self.neighbors(descriptors, self.k + exclude_self)
+        if exclude_self:
+            dist = dist[:, 1:]
+        if not dist.shape[1]:
+            return np.full(len(dist), np.inf)
+        return dist.mean(axis=1)
+
+    def add_novel(self, genes, threshold: float) -> np.ndarray:
+        """
+        Add the genes whose novelty is above threshold, in order (each one
+        added counts against the rest). Returns the mask of added genes.
+        """
+        genes = as_array(genes).reshape(-1, GENE_LEN)
+        descriptors = self.describe(genes)
+        added = np.zeros(len(genes), dtype=bool)
+        for i in range(len(genes)):
+            if self.novelty(descriptors[i])[0] > threshold:
+                self.add(genes[i:i + 1], descriptors[i:i + 1])
+                added[i] = True
+        return added
+
+    def diverse(self, n: int, seed: Optional[int] = None) -> list[list[int]]:
+        """
+        n archive genes spread out in behavior (greedy farthest-point
+        sampling from a random start), e.g. as an opponent pool.
+        """
+        n = min(n, len(self))
+        if n == 0:
+            return []
+        rng = np.random.default_rng(seed)
+        chosen = [int(rng.integers(len(self)))]
+        nearest = np.sqrt(((self.descriptors - self.descriptors[chosen[0]]) ** 2).sum(axis=1))
+        for _ in range(n - 1):
+            i = int(np.argmax(nearest))
+            chosen.append(i)
+            nearest = np.minimum(nearest, np.sqrt(((self.descriptors - self.descriptors[i]) ** 2).sum(axis=1)))
+        return self.genes[chosen].tolist()
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(path, genes=self.genes, descriptors=self.descriptors, reference=self.reference)
+
+    @classmethod
+    def load(cls, path: str, k: int = 15, leaf_size: int = 32, max_buffer: int = 2048,
+             cache=None) -> "NoveltyArchive":
+        with np.load(path) as data:
+            archive = cls(k=k, reference=data["reference"], leaf_size=leaf_size, max_buffer=max_buffer,
+                          cache=cache)
+            archive.genes = data["genes"]
+            archive.descriptors = data["descriptors"]
+        if len(archive):
+            archive._tree = KDTree(archive.descriptors, leaf_size)
+        return archive
@@ -0,0 +1,177 @@
+"""
+Out-of-core round robin results for very large gene ladders.
+
+A ResultMatrix is a directory of .npy files, all opened memory-mapped:
+
+    genes.npy    (N, 50) uint8   the ladder
+    rounds.npy   (N, N)  int16   rounds[i, j] = rounds[j, i] of the duel
+    counts.npy   (N, N)  uint8   counts[i, j] = mites of gene i left after
+                                 gene i battled gene j
+    done.npy     (T, T)  bool    finished tiles (upper triangle only)
+
+(counts go up to 171, hence uint8 rather than int8.) As in
+score.round_robin_tournament, gene i battles gene j as the first gene for
+i < j. The duels are played in square tiles of `tile` genes on a thread
+pool. A tile is marked done only after its results are flushed, so an
+interrupted compute() picks up where it stopped. The aggregate queries
+stream over the files tile by tile and never load a whole matrix:
+
+    matrix = ResultMatrix.create("ladder.rm", sequences)
+    matrix.compute()
+    print(matrix.top_k(10))
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from numpy.lib.format import open_memmap
+import _PyPacwar
+from score import score_array
+
+
+class ResultMatrix:
+    """
+    Memory-mapped pairwise duel results. Use create() for a new ladder and
+    ResultMatrix(path) to reopen one.
+    """
+
+    def __init__(self, path: str, mode: str = "r+"):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.n, self.tile = meta["n"], meta["tile"]
+        self.genes = np.load(os.path.join(path, "genes.npy"), mmap_mode="r")
+        self.rounds = open_memmap(os.path.join(path, "rounds.npy"), mode=mode)
+        self.counts = open_memmap(os.path.join(path, "counts.npy"), mode=mode)
+        self.done = open_memmap(os.path.join(path, "done.npy"), mode=mode)
+
+    @classmethod
+    def create(cls, path: str, sequences, tile: int = 256) -> "ResultMatrix":
+        """
+        Lay out the files for a new ladder (no duels are played yet).
+
+        Args:
+            path: Directory to create
+            sequences: (N, 50) genes, each a list of 50 integers (0-3)
+            tile: Side of the square tiles the duels are played in
+        """
+        genes = np.asarray(sequences, dtype=np.uint8).reshape(-1, 50)
+        if genes.size and genes.max() > 3:
+            raise ValueError("gene alleles must be in 0..3")
+        n = len(genes)
+        t = -(-n // tile)
+        os.makedirs(path)
+        np.save(os.path.join(path, "genes.npy"), genes)
+        for name, dtype, shape in (
+            ("rounds", np.int16, (n, n)),
+            ("counts", np.uint8, (n, n)),
+            ("done", np.bool_, (t, t)),
+        ):
+            # a fresh memmap is zero-filled lazily, so this stays sparse on disk
+            array = open_memmap(os.path.join(path, name + ".npy"), mode="w+", dtype=dtype, shape=shape)
+            del array
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"n": n, "tile": tile}, f)
+        return cls(path)
+
+    def _span(self, b: int) -> slice:
+        return slice(b * self.tile, min((b + 1) * self.tile, self.n))
+
+    def pending_tiles(self) -> List[tuple[int, int]]:
+        """
+        (row block, column block) of every tile still to play, row <= column.
+        """
+        t = len(self.done)
+        return [(a, b) for a in range(t) for b in range(a, t) if not self.done[a, b]]
+
+    @property
+    def complete(self) -> bool:
+        return not self.pending_tiles()
+
+    def _play_tile(self, a: int, b: int) -> None:
+        rows, cols = self._span(a), self._span(b)
+        genes_r = np.asarray(self.genes[rows], dtype=np.int32)
+        if a == b:
+            # compute() already runs one tile per CPU
+            results, _ = _PyPacwar.round_robin(genes_r, threads=1)
+        else:
+            genes_c = np.asarray(self.genes[cols], dtype=np.int32)
+            nr, nc = len(genes_r), len(genes_c)
+            results = _PyPacwar.battle_many(
+                np.repeat(genes_r, nc, axis=0), np.tile(genes_c, (nr, 1))
+            ).reshape(nr, nc, 3)
+            self.rounds[cols, rows] = results[:, :, 0].T
+            self.counts[cols, rows] = results[:, :, 2].T
+        self.rounds[rows, cols] = results[:, :, 0]
+        self.counts[rows, cols] = results[:, :, 1]
+
+    def compute(self, max_workers: Optional[int] = None, max_tiles: Optional[int] = None) -> int:
+        """
+        Play the pending tiles on a thread pool (_PyPacwar releases the GIL
+        while it simulates). Each finished batch of tiles is flushed before
+        it is marked done.
+
+        Args:
+            max_workers: Number of threads (defaults to the CPU count)
+            max_tiles: Stop after this many tiles (None plays them all)
+
+        Returns:
+            The number of tiles played
+        """
+        pending = self.pending_tiles()[:max_tiles]
+        workers = max_workers or os.cpu_count()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Batches of one tile per thread bound the work lost to a crash
+            for start in range(0, len(pending), workers):
+                batch = pending[start:start + workers]
+                list(pool.map(lambda tile: self._play_tile(*tile), batch))
+                self.rounds.flush()
+                self.counts.flush()
+                for a, b in batch:
+                    self.done[a, b] = True
+                self.done.flush()
+        return len(pending)
+
+    def result(self, i: int, j: int) -> tuple[int, int, int]:
+        """
+        (rounds, count of i, count of j) of gene i against gene j.
+        """
+        return int(self.rounds[i, j]), int(self.counts[i, j]), int(self.counts[j, i])
+
+    def totals(self) -> np.ndarray:
+        """
+        Accumulated scores per gene, as from score.round_robin_tournament,
+        streamed tile by tile. Tiles not yet played count for nothing.
+        """
+        totals = np.zeros(self.n, dtype=np.int64)
+        t = len(self.done)
+        for a in range(t):
+            rows = self._span(a)
+            for b in range(a, t):
+                if not self.done[a, b]:
+                    continue
+                cols = self._span(b)
+                results = np.stack([
+                    self.rounds[rows, cols],
+                    self.counts[rows, cols],
+                    self.counts[cols, rows].T,
+                ], axis=-1)
+                points = score_array(results.reshape(-1, 3)).reshape(*results.shape[:2], 2)
+                if a == b:
+                    upper = np.triu(np.ones(results.shape[:2], dtype=bool), 1)
+                    points = points * upper[:, :, None]
+                totals[rows] += points[:, :, 0].sum(axis=1)
+                totals[cols] += points[:, :, 1].sum(axis=0)
+        return totals
+
+    def top_k(self, k: int) -> List[tuple[int, int]]:
+        """
+        (index, total) of the k best genes, best first.
+        """
+        totals = self.totals()
+        k = min(k, self.n)
+        best = np.argpartition(-totals, k - 1)[:k] if k else np.zeros(0, dtype=np.intp)
+        best = best[np.argsort(-totals[best], kind="stable")]
+        return [(int(i), int(totals[i])) for i in best]
@@ -1,5 +1,8 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import _PyPacwar
-from typing import List
+from typing import List, Optional
 from PyPacwarExample import str_to_seq
 
 def score(rounds: int, c1: int, c2: int) -> tuple[int, int]:
@@ -83,36 +86,216 @@ def score(rounds: int, c1: int, c2: int) -> tuple[int, int]:
     return (10, 10)
 
 
-def round_robin_tournament(sequences: List[List[int]]) -> List[int]:
+def score_array(results) -> np.ndarray:
+    """
+    Vectorized score: score both genes of every battle in one call.
+
+    Args:
+        results: An (N, 3) array of (rounds, c1, c2) rows, e.g. from
+            _PyPacwar.battle_many
+
+    Returns:
+        An (N, 2) int array of (score1, score2) rows
+    """
+    results = np.asarray(results, dtype=np.int64).reshape(-1, 3)
+    rounds, c1, c2 = results.T
+    band = np.minimum(rounds // 100, 3)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = c1 / c2
+        inv_ratio = c2 / c1
+    score1 = np.select(
+        [
+            c2 == 0,
+            c1 == 0,
+            rounds != 500,
+            ratio >= 10.0,
+            ratio >= 3.0,
+            ratio >= 1.5,
+            inv_ratio >= 10.0,
+            inv_ratio >= 3.0,
+            inv_ratio >= 1.5,
+        ],
+        [20 - band, band, 10, 13, 12, 11, 7, 8, 9],
+        10,
+    )
+    # Every outcome splits 20 points between the two genes
+    return np.stack([score1, 20 - score1], axis=1)
+
+
+def round_robin_tournament(sequences: List[List[int]], threads: int = 0) -> List[int]:
     """
     Run a round-robin tournament where each sequence battles every other sequence.
     Accumulates points for each sequence using the score function.
-    
+
+    The duels and the scoring run natively in _PyPacwar.round_robin, split
+    over `threads` native threads.
+
     Args:
         sequences: A list of sequences, where each sequence is a list of 50 integers (0-3)
-    
+        threads: Number of native threads to use (0 means one per CPU)
+
+    Returns:
+        A list of accumulated scores, one for each sequence in the same order
+    """
+    if not sequences:
+        return []
+
+    # points[i, j] is what sequence i earned against sequence j
+    _results, points = _PyPacwar.round_robin(sequences, threads=threads)
+    return points.sum(axis=1).tolist()
+
+
+def round_robin_tournament_threaded(
+    sequences: List[List[int]], max_workers: Optional[int] = None, cache=None
+) -> List[int]:
+    """
+    Same as round_robin_tournament, but spreads the duels over a thread pool.
+
+    _PyPacwar releases the GIL while it simulates, so threads scale across
+    cores without the process-spawn and pickling cost of a process pool.
+    Each task plays one sequence against all later ones in a single
+    battle_many call.
+
+    Args:
+        sequences: A list of sequences, where each sequence is a list of 50 integers (0-3)
+        max_workers: Number of threads to use (defaults to the CPU count)
+        cache: Optional duelcache.DuelCache; pairs it already holds are not replayed
+
     Returns:
         A list of accumulated scores, one for each sequence in the same order
     """
     n = len(sequences)
     scores = [0] * n
-    
-    # Battle each sequence against every other sequence
-    for i in range(n):
-        for j in range(i + 1, n):
-            # Battle sequence i against sequence j
-            rounds, c1, c2 = _PyPacwar.battle(sequences[i], sequences[j])
-            
-            # Get scores for this battle
-            # c1 is count for sequences[i], c2 is count for sequences[j]
-            score1, score2 = score(rounds, c1, c2)
-            
-            # Accumulate scores
-            scores[i] += score1
-            scores[j] += score2
-    
+
+    def play_row(i: int):
+        return (_PyPacwar if cache is None else cache).battle_many(sequences[i], sequences[i + 1:])
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        # The longest rows go first so the pool drains evenly.
+        for i, results in enumerate(pool.map(play_row, range(n - 1))):
+            points = score_array(results)
+            scores[i] += int(points[:, 0].sum())
+            for j, score2 in enumerate(points[:, 1].tolist(), start=i + 1):
+                scores[j] += score2
+
     return scores
 
+class Tournament:
+    """
+    A round robin that keeps its pairwise results, so the ladder can grow
+    and shrink without replaying old duels.
+
+    Gene i always battles gene j (i < j) as the first gene, just like
+    round_robin_tournament, so totals() matches a full recomputation over
+    the same sequences in the same order.
+
+    Args:
+        sequences: Initial sequences, each a list of 50 integers (0-3)
+        max_workers: Number of threads to play new duels on (defaults to
+            the CPU count)
+    """
+
+    def __init__(self, sequences: Optional[List[List[int]]] = None, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self.genes = np.zeros((0, 50), dtype=np.int32)
+        # results[i, j] is (rounds, count of i, count of j) for i against j
+        self.results = np.zeros((0, 0, 3), dtype=np.int32)
+        # points[i, j] is what gene i earned against gene j
+        self.points = np.zeros((0, 0), dtype=np.int32)
+        self._totals = np.zeros(0, dtype=np.int64)
+        if sequences:
+            self.add(sequences)
+
+    def __len__(self) -> int:
+        return len(self.genes)
+
+    def add(self, sequences: List[List[int]]) -> None:
+        """
+        Add sequences to the ladder, playing only their duels against the
+        current genes and each other.
+        """
+        new = np.asarray(sequences, dtype=np.int32).reshape(-1, 50)
+        n, k = len(self.genes), len(new)
+        if k == 0:
+            return
+        genes = np.concatenate([self.genes, new])
+
+        results = np.zeros((n + k, n + k, 3), dtype=np.int32)
+        results[:n, :n] = self.results
+        # New genes come last, so the current genes battle them as gene 1
+        if n:
+            def play_column(i: int):
+                return _PyPacwar.battle_many(self.genes, new[i])
+
+            with ThreadPoolExecutor(max_workers=self.max_workers or os.cpu_count()) as pool:
+                for i, column in enumerate(pool.map(play_column, range(k))):
+                    results[:n, n + i] = column
+                    results[n + i, :n] = column[:, [0, 2, 1]]
+        if k > 1:
+            results[n:, n:], _ = _PyPacwar.round_robin(new)
+
+        points = np.zeros((n + k, n + k), dtype=np.int32)
+        points[:n, :n] = self.points
+        new_points = score_array(results[:, n:].reshape(-1, 3)).reshape(n + k, k, 2)
+        points[:, n:] = new_points[:, :, 0]
+        points[n:, :] = new_points[:, :, 1].T
+        np.fill_diagonal(points, 0)
+
+        totals = np.zeros(n + k, dtype=np.int64)
+        totals[:n] = self._totals + points[:n, n:].sum(axis=1)
+        totals[n:] = points[n:].sum(axis=1)
+        self.genes, self.results, self.points, self._totals = genes, results, points, totals
+
+    def remove(self, indices) -> None:
+        """
+        Drop the genes at the given indices (and their duels); the remaining
+        genes keep their order.
+        """
+        keep = np.ones(len(self.genes), dtype=bool)
+        keep[indices] = False
+        self._totals = self._totals[keep] - self.points[keep][:, ~keep].sum(axis=1)
+        self.genes = self.genes[keep]
+        self.results = self.results[keep][:, keep]
+        self.points = self.points[keep][:, keep]
+
+    def totals(self) -> List[int]:
+        """
+        Accumulated scores, one per gene, as from round_robin_tournament.
+        """
+        return self._totals.tolist()
+
+    def standings(self) -> List[tuple[int, int]]:
+        """
+        (index, total) pairs, best first.
+        """
+        order = np.argsort(-self._totals, kind="stable")
+        return [(int(i), int(self._totals[i])) for i in order]
+
+    def save(self, path: str) -> None:
+        """
+        Save the genes and results to an .npz file.
+        """
+        np.savez_compressed(path, genes=self.genes, results=self.results)
+
+    @classmethod
+    def load(cls, path: str, max_workers: Optional[int] = None) -> "Tournament":
+        """
+        Load a tournament written by save.
+        """
+        tournament = cls(max_workers=max_workers)
+        with np.load(path) as data:
+            tournament.genes = data["genes"]
+            tournament.results = data["results"]
+        n = len(tournament.genes)
+        upper = np.triu_indices(n, 1)
+        points = score_array(tournament.results[upper])
+        tournament.points = np.zeros((n, n), dtype=np.int32)
+        tournament.points[upper] = points[:, 0]
+        tournament.points[upper[1], upper[0]] = points[:, 1]
+        tournament._totals = tournament.points.sum(axis=1, dtype=np.int64)
+        return tournament
+
+
 if __name__ == "__main__":
     genes = [
         "1" * 50,
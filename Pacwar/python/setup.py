@@ -3,10 +3,16 @@
 
 # define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
 
+import sys
 import numpy as np
 from distutils.core import setup, Extension
 
+# round_robin runs its duels on native threads
+libraries = [] if sys.platform == "win32" else ["pthread"]
+
 setup(
-    ext_modules=[Extension("_PyPacwar", ["PyPacwar.c", "PacWarGuts.c"])],
+    ext_modules=[
+        Extension("_PyPacwar", ["PyPacwar.c", "PacWarGuts.c", "PacWarBits.c"], libraries=libraries)
+    ],
     include_dirs=[np.get_include()],
 )
@@ -0,0 +1,252 @@
+"""
+Duel result cache in shared memory, for process pools.
+
+duelcache.DuelCache lives in one process, so pool workers each rediscover
+the same results. A SharedDuelCache is a fixed-size open-addressing hash
+table in a multiprocessing.shared_memory block: every process that holds it
+(pool workers receive it by pickling, which only sends the block's name)
+reads and writes the same slots, and nothing is locked.
+
+Each slot is ten uint32 words: the 26-byte packed gene pair (7 words), the
+result (rounds | c1 << 16 | c2 << 24), a checksum of key and result, and a
+last-used stamp. A writer clears the checksum, writes key and result, then
+sets the checksum; a reader only believes a slot whose checksum matches, so
+a read that races a write is just a miss. A key lives in one of `probe`
+consecutive slots after its hash. When all of them are taken, the insert
+evicts the least recently used one (the oldest stamp; hits refresh it).
+
+    cache = SharedDuelCache(slots=1 << 20)
+    hill_climb(me, opponents, cache=cache, workers=4)
+    print(cache.stats())
+    cache.close()          # the creating process also frees the block
+"""
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import numpy as np
+from duelcache import DuelCache
+
+_MAGIC = 0x50574443
+_HEADER_WORDS = 16
+_SLOT_WORDS = 10
+_KEY, _RESULT, _CHECK, _STAMP = slice(0, 7), 7, 8, 9
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(words: np.ndarray, seed: int) -> np.ndarray:
+    # multiply-xorshift hash over the last axis, as uint64
+    h = np.full(words.shape[:-1], seed, dtype=np.uint64)
+    for i in range(words.shape[-1]):
+        h ^= words[..., i].astype(np.uint64)
+        h *= _MIX
+        h ^= h >> np.uint64(29)
+    return h
+
+
+def _checksum(key_words: np.ndarray, results: np.ndarray) -> np.ndarray:
+    words = np.concatenate([key_words, results[..., None]], axis=-1)
+    return (_mix(words, 0x243F6A88).astype(np.uint32)) | np.uint32(1)
+
+
+def _key_words(keys: list[bytes]) -> np.ndarray:
+    raw = np.zeros((len(keys), 28), dtype=np.uint8)
+    raw[:, :26] = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(len(keys), 26)
+    return raw.view(np.uint32)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Open an existing block without registering it with this process's
+    # resource tracker, which would otherwise free it when the process
+    # exits (Python < 3.13 has no track=False).
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _stamp() -> int:
+    # milliseconds on the system-wide monotonic clock, so stamps compare
+    # across processes
+    return int(time.monotonic() * 1000) & 0xFFFFFFFF
+
+
+class SharedDuelCache:
+    """
+    Lock-free shared-memory duel cache. battle / battle_many work as in
+    DuelCache, so it can be passed as cache= to the searches, including
+    their process-pool paths.
+
+    Args:
+        slots: Number of table slots (40 bytes each)
+        probe: Slots a key may occupy after its hash
+        name: Name for the shared memory block (random if None)
+    """
+
+    def __init__(self, slots: int = 1 << 20, probe: int = 8, name: Optional[str] = None):
+        size = 4 * (_HEADER_WORDS + slots * _SLOT_WORDS)
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self._owner = True
+        header = np.ndarray((_HEADER_WORDS,), dtype=np.uint32, buffer=self._shm.buf)
+        header[:3] = (_MAGIC, slots, probe)
+        del header
+        self._map()
+        self._table[:] = 0
+        self._reset_counters()
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedDuelCache":
+        """
+        Open the cache another process created under this name.
+        """
+        cache = cls.__new__(cls)
+        cache._open(name)
+        return cache
+
+    def _open(self, name: str):
+        self._shm = _attach(name)
+        self._owner = False
+        self._map()
+        self._reset_counters()
+
+    def _map(self):
+        words = np.ndarray((self._shm.size // 4,), dtype=np.uint32, buffer=self._shm.buf)
+        self._header = words[:_HEADER_WORDS]
+        if self._header[0] != _MAGIC:
+            raise ValueError(f"{self._shm.name} is not a SharedDuelCache")
+        self.slots, self.probe = int(self._header[1]), int(self._header[2])
+        self._table = words[_HEADER_WORDS:_HEADER_WORDS + self.slots * _SLOT_WORDS].reshape(-1, _SLOT_WORDS)
+
+    def _reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.evictions = 0
+        self.torn = 0
+
+    # Pool workers get the block by name; the creator alone frees it.
+    def __getstate__(self):
+        return {"name": self._shm.name}
+
+    def __setstate__(self, state):
+        self._open(state["name"])
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._table[:, _CHECK]))
+
+    def _windows(self, words: np.ndarray) -> np.ndarray:
+        home = _mix(words, 0) % np.uint64(self.slots)
+        return (home.astype(np.int64)[:, None] + np.arange(self.probe)) % self.slots
+
+    def get_many(self, keys: list[bytes]) -> list[Optional[tuple[int, int, int]]]:
+        """
+        Bulk lookup. Returns the cached result for each key, or None.
+        """
+        if not keys:
+            return []
+        words = _key_words(keys)
+        idx = self._windows(words)
+        snap = self._table[idx]
+        same_key = (snap[:, :, _KEY] == words[:, None, :]).all(axis=-1) & (snap[:, :, _CHECK] != 0)
+        valid = snap[:, :, _CHECK] == _checksum(snap[:, :, _KEY], snap[:, :, _RESULT])
+        found = same_key & valid
+        self.torn += int(np.count_nonzero(same_key & ~valid))
+
+        rows = np.flatnonzero(found.any(axis=1))
+        cols = found[rows].argmax(axis=1)
+        self._table[idx[rows, cols], _STAMP] = _stamp()
+        packed = snap[rows, cols, _RESULT]
+
+        out: list[Optional[tuple[int, int, int]]] = [None] * len(keys)
+        for row, value in zip(rows.tolist(), packed.tolist()):
+            out[row] = (value & 0xFFFF, (value >> 16) & 0xFF, value >> 24)
+        self.hits += len(rows)
+        self.misses += len(keys) - len(rows)
+        return out
+
+    def put_many(self, keys: list[bytes], results) -> None:
+        """
+        Bulk insert of (rounds, c1, c2) results, evicting the least recently
+        used slot of a full probe window.
+        """
+        if not keys:
+            return
+        words = _key_words(keys)
+        results = np.asarray(results, dtype=np.uint32).reshape(-1, 3)
+        packed = results[:, 0] | (results[:, 1] << 16) | (results[:, 2] << 24)
+        checks = _checksum(words, packed)
+        stamp = _stamp()
+        table = self._table
+        for key, window, value, check in zip(words, self._windows(words), packed, checks):
+            slots = table[window]
+            same = np.flatnonzero((slots[:, _KEY] == key).all(axis=1))
+            empty = np.flatnonzero(slots[:, _CHECK] == 0)
+            if len(same):
+                slot = window[same[0]]
+            elif len(empty):
+                slot = window[empty[0]]
+            else:
+                slot = window[np.argmin(slots[:, _STAMP])]
+                self.evictions += 1
+            table[slot, _CHECK] = 0
+            table[slot, _KEY] = key
+            table[slot, _RESULT] = value
+            table[slot, _STAMP] = stamp
+            table[slot, _CHECK] = check
+            self.inserts += 1
+
+    # The lookup-then-play logic only goes through get_many / put_many.
+    battle_many = DuelCache.battle_many
+    battle = DuelCache.battle
+
+    def stats(self) -> dict:
+        """
+        Table occupancy (shared) and hit / miss / eviction counters (this
+        process only).
+        """
+        occupied = len(self)
+        lookups = self.hits + self.misses
+        return {
+            "slots": self.slots,
+            "occupied": occupied,
+            "load_factor": occupied / self.slots,
+            "probe": self.probe,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "inserts": self.inserts,
+            "evictions": self.evictions,
+            "torn_reads": self.torn,
+        }
+
+    def clear(self) -> None:
+        self._table[:] = 0
+
+    def close(self) -> None:
+        """
+        Detach; the creating process also frees the block.
+        """
+        if self._shm is None:
+            return
+        self._header = self._table = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()